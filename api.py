@@ -1,19 +1,69 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, FileResponse
+from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
 import uuid
-import json
+import orjson
+import hashlib
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
 
 # Models and DB
-from core.database import get_db, Notebook, Document, ChatMessage, Artifact
-from core.storage_manager import save_raw_file, get_chroma_db_dir, delete_notebook_storage, get_notebook_subdir
+from core.database import (
+    get_db, get_owned_notebook, get_artifact_content, upsert_artifact, delete_notebooks, get_chat_history, commit_session,
+    SessionLocal, Notebook, Document, ChatMessage, Artifact,
+)
+from core.storage_manager import (
+    save_raw_file, create_raw_upload, commit_raw_upload, save_extracted_text, load_extracted_text, load_notebook_text,
+    get_chroma_db_dir, delete_notebook_storage, get_notebook_subdir, save_artifact_file, resolve_notebook_path,
+)
 import os
-from core.vector_store import VectorStore
+from core.vector_store import get_vector_store, evict_vector_store
+from core.semantic_cache import SemanticCache
+from core.cache import LRUCache
 # Specific feature logic
-from core.chunker import chunk_text
+from core.chunker import chunk_text, count_words, dedupe_chunks
 from core.ingestion import ingest_source
+from core.groq_client import groq_astream, is_rate_limit_message
+from features.chat import build_rag_messages, retrieve_context
+
+# Worker processes for text extraction; PDF parsing holds the GIL, so threads would not help
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0")) or os.cpu_count()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model once at boot instead of on the first upload/chat
+    from core.embedder import warmup
+    await run_in_threadpool(warmup)
+    print("[ThinkBook] Embedding model ready")
+    # spawn, not fork: children must not inherit the loaded torch model or open SQLite handles
+    app.state.parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield
+    finally:
+        app.state.parse_pool.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="NotebookLM API Layer", lifespan=lifespan)
+
+# File types /api/upload can extract text from
+ALLOWED_EXTS = frozenset({"pdf", "pptx", "txt"})
+
+# Uploads are copied to disk in pieces of this size instead of being read into one bytes object
+UPLOAD_CHUNK_SIZE = 1 << 20
 
-app = FastAPI(title="NotebookLM API Layer")
+# Near-duplicate chat questions per (user, notebook) reuse the previous answer
+chat_cache = SemanticCache(max_entries=128, threshold=0.95, ttl=3600)
+
+# Hot artifacts kept in memory: (hf_user_id, notebook_id, cache_key) -> stored Artifact.content
+ARTIFACT_CACHE_BYTES = int(os.environ.get("ARTIFACT_CACHE_MB", "256")) << 20
+artifact_cache = LRUCache(maxsize=ARTIFACT_CACHE_BYTES, getsizeof=len)
 
 def verify_hf_user(x_hf_user: str = Header(None)) -> str:
     """Extracts HF user ID from headers. Sent by the Gradio frontend."""
@@ -21,16 +71,32 @@ def verify_hf_user(x_hf_user: str = Header(None)) -> str:
         raise HTTPException(status_code=401, detail="Missing X-HF-User header. Please log in.")
     return x_hf_user
 
-@app.get("/api/notebooks")
+# Response models: with these declared FastAPI validates rows straight from attributes
+# and pydantic-core writes the JSON bytes, no intermediate dicts or stdlib json
+class NotebookOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: str
+    title: str
+
+class ChatMessageOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    role: str
+    content: str
+
+@app.get("/api/notebooks", response_model=List[NotebookOut])
 def list_notebooks(hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
     """Fetch all notebooks for the authenticated user"""
-    notebooks = db.query(Notebook).filter(Notebook.hf_user_id == hf_user_id).order_by(Notebook.created_at.desc()).all()
-    return [{"id": nb.notebook_id, "title": nb.title} for nb in notebooks]
+    stmt = (
+        select(Notebook.notebook_id.label("id"), Notebook.title)
+        .where(Notebook.hf_user_id == hf_user_id)
+        .order_by(Notebook.created_at.desc())
+    )
+    return db.execute(stmt).all()
 
-@app.get("/api/notebooks/{notebook_id}/files")
+@app.get("/api/notebooks/{notebook_id}/files", response_model=List[str])
 def get_notebook_files(notebook_id: str, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
     """Fetch physical absolute paths of all uploaded raw files to render in Gradio"""
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id).first()
+    notebook = get_owned_notebook(db, notebook_id, hf_user_id)
     if not notebook:
         raise HTTPException(status_code=404, detail="Notebook not found")
         
@@ -38,30 +104,49 @@ def get_notebook_files(notebook_id: str, hf_user_id: str = Depends(verify_hf_use
     if not os.path.exists(raw_dir):
         return []
     
-    files = [os.path.join(raw_dir, f) for f in os.listdir(raw_dir) if os.path.isfile(os.path.join(raw_dir, f))]
+    # Skip hidden in-flight uploads (.upload-*.part)
+    files = [os.path.join(raw_dir, f) for f in os.listdir(raw_dir) if not f.startswith(".") and os.path.isfile(os.path.join(raw_dir, f))]
     return files
 
-@app.get("/api/notebooks/{notebook_id}/chats")
+@app.get("/api/notebooks/{notebook_id}/chats", response_model=List[ChatMessageOut])
 def get_notebook_chats(notebook_id: str, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
     """Fetch all history to hydrate Gradio ChatComponent"""
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id).first()
+    notebook = get_owned_notebook(db, notebook_id, hf_user_id)
     if not notebook:
         raise HTTPException(status_code=404, detail="Notebook not found")
         
-    history_records = db.query(ChatMessage).filter(ChatMessage.notebook_id == notebook_id).order_by(ChatMessage.created_at).all()
-    history = [{"role": msg.role, "content": msg.content} for msg in history_records]
-    return history
+    # Only the two columns the UI needs, straight off the (notebook_id, created_at) index
+    return get_chat_history(db, notebook_id)
 
-@app.get("/api/notebooks/{notebook_id}/artifacts")
+@app.get("/api/notebooks/{notebook_id}/artifacts", response_model=Dict[str, str])
 def get_notebook_artifacts(notebook_id: str, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
     """Fetch all generated artifacts for the notebook to hydrate UI tabs"""
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id).first()
+    notebook = get_owned_notebook(db, notebook_id, hf_user_id, selectinload(Notebook.artifacts))
     if not notebook:
         raise HTTPException(status_code=404, detail="Notebook not found")
         
-    artifacts = db.query(Artifact).filter(Artifact.notebook_id == notebook_id).all()
-    # Return as a dictionary mapped by artifact_type for easy frontend lookup
-    return {a.artifact_type: a.content for a in artifacts}
+    # Return as a dictionary mapped by artifact_type for easy frontend lookup.
+    # Audio is binary, so hand back where to download it instead of the stored path
+    return {
+        a.artifact_type: (f"/api/notebooks/{notebook_id}/audio" if a.artifact_type == "podcast_audio" else a.content)
+        for a in notebook.artifacts
+    }
+
+@app.get("/api/notebooks/{notebook_id}/audio")
+def get_notebook_audio(notebook_id: str, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
+    """Streams the notebook's synthesized podcast MP3 straight from disk"""
+    if not get_owned_notebook(db, notebook_id, hf_user_id):
+        raise HTTPException(status_code=404, detail="Notebook not found")
+
+    content = get_artifact_content(db, notebook_id, "podcast_audio")
+    rel_path = content and _podcast_audio_path(db, hf_user_id, notebook_id, content)
+    if not rel_path:
+        raise HTTPException(status_code=404, detail="No podcast audio generated yet")
+    return FileResponse(resolve_notebook_path(hf_user_id, notebook_id, rel_path), media_type="audio/mpeg")
+
+def _write_upload_chunk(tmp, hasher, chunk: bytes):
+    tmp.write(chunk)
+    hasher.update(chunk)
 
 @app.post("/api/upload")
 async def upload_document(
@@ -79,13 +164,14 @@ async def upload_document(
     4. Chunk and vectorize into ChromaDB
     5. Save Database metadata
     """
-    if not file.filename.endswith((".pdf", ".pptx", ".txt")):
+    ext = os.path.splitext(file.filename)[1][1:].lower()
+    if ext not in ALLOWED_EXTS:
         raise HTTPException(status_code=400, detail="Unsupported file format.")
 
     # 1. Find or create notebook
     notebook = None
     if notebook_id:
-        notebook = db.query(Notebook).filter(Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id).first()
+        notebook = get_owned_notebook(db, notebook_id, hf_user_id)
         if not notebook:
             raise HTTPException(status_code=404, detail="Notebook ID provided but not found.")
     elif notebook_name:
@@ -93,39 +179,81 @@ async def upload_document(
         if not notebook:
             notebook = Notebook(notebook_id=str(uuid.uuid4()), hf_user_id=hf_user_id, title=notebook_name)
             db.add(notebook)
-            db.commit()
+            # Flush only: the notebook is committed together with its first document
+            db.flush()
     else:
         raise HTTPException(status_code=400, detail="Must provide either notebook_name or notebook_id")
 
-    # 2. Extract Raw Bytes & Vectorize
-    raw_bytes = await file.read()
-    raw_text = ingest_source(file.filename.split('.')[-1].lower(), raw_bytes)
-    
-    if not raw_text or len(raw_text.strip()) < 50:
-         raise HTTPException(status_code=400, detail="Could not extract enough text from file.")
-
-    chunks = chunk_text(raw_text)
-    
-    # 3. Store Vectors in specific Chromadb folder
-    chroma_dir = get_chroma_db_dir(hf_user_id, notebook.notebook_id)
-    vstore = VectorStore(chroma_dir)
-    vstore.add_chunks(chunks, source_filename=file.filename)
-
-    # 4. Save metadata to DB
-    doc = Document(
-        doc_id=str(uuid.uuid4()),
-        notebook_id=notebook.notebook_id,
-        filename=file.filename,
-        file_type=file.filename.split('.')[-1].lower(),
-        chunk_count=len(chunks)
-    )
-    db.add(doc)
-    db.commit()
-
-    # 5. Persist original file (optional, follows architecture tree)
-    save_raw_file(hf_user_id, notebook.notebook_id, file.filename, raw_bytes)
+    # 2. Stream the upload to disk piece by piece (hashing as we go), then extract text straight from the file
+    hasher = hashlib.sha256()
+    tmp = create_raw_upload(hf_user_id, notebook.notebook_id)
+    try:
+        with tmp:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                # Disk write + hash of each piece run off the event loop so other requests keep flowing
+                await run_in_threadpool(_write_upload_chunk, tmp, hasher, chunk)
+        digest = hasher.hexdigest()
+
+        # Identical file already in this notebook: skip extraction, chunking and embedding entirely
+        existing_doc = db.query(Document).filter(Document.notebook_id == notebook.notebook_id, Document.content_sha256 == digest).first()
+        if existing_doc:
+            return {"status": "success", "notebook_id": notebook.notebook_id, "chunks": existing_doc.chunk_count, "doc_id": existing_doc.doc_id, "duplicate": True}
+
+        # Parse in a worker process straight from the temp file, so only the path is pickled over
+        loop = asyncio.get_running_loop()
+        raw_text = await loop.run_in_executor(app.state.parse_pool, ingest_source, ext, tmp.name)
+        
+        if not raw_text or len(raw_text.strip()) < 50:
+             raise HTTPException(status_code=400, detail="Could not extract enough text from file.")
 
-    return {"status": "success", "notebook_id": notebook.notebook_id, "chunks": len(chunks)}
+        chunks = dedupe_chunks(chunk_text(raw_text))
+        
+        # 3. Store Vectors in specific Chromadb folder
+        chroma_dir = get_chroma_db_dir(hf_user_id, notebook.notebook_id)
+        vstore = get_vector_store(chroma_dir)
+        chunk_ids = await run_in_threadpool(vstore.add_chunks, chunks, source_filename=file.filename)
+
+        # 4. Save metadata to DB, keeping the extracted text so generation never has to rebuild it from Chroma
+        doc = Document(
+            doc_id=str(uuid.uuid4()),
+            notebook_id=notebook.notebook_id,
+            filename=file.filename,
+            file_type=ext,
+            chunk_count=len(chunks),
+            word_count=count_words(raw_text),
+            content_sha256=digest,
+        )
+        text_path = await run_in_threadpool(save_extracted_text, hf_user_id, notebook.notebook_id, doc.doc_id, raw_text)
+        db.add(doc)
+        # New sources make every stored artifact stale; deleted in the same commit as the Document
+        db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id).delete(synchronize_session=False)
+        try:
+            await run_in_threadpool(commit_session, db)
+        except IntegrityError:
+            # A concurrent upload of the same file committed first (ix_document_nb_sha256): undo this copy, return theirs
+            db.rollback()
+            await run_in_threadpool(vstore.delete_chunks, chunk_ids)
+            os.remove(text_path)
+            existing_doc = db.query(Document).filter(Document.notebook_id == notebook.notebook_id, Document.content_sha256 == digest).first()
+            if not existing_doc:
+                raise
+            return {"status": "success", "notebook_id": notebook.notebook_id, "chunks": existing_doc.chunk_count, "doc_id": existing_doc.doc_id, "duplicate": True}
+
+        # 5. Persist original file by renaming the streamed copy into place
+        commit_raw_upload(hf_user_id, notebook.notebook_id, file.filename, tmp.name)
+    except Exception:
+        # A failed extract/embed must not leave a half-created notebook behind
+        db.rollback()
+        raise
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+    # New sources can change answers, so drop cached chat responses and artifacts
+    chat_cache.invalidate((hf_user_id, notebook.notebook_id))
+    artifact_cache.invalidate_prefix((hf_user_id, notebook.notebook_id))
+
+    return {"status": "success", "notebook_id": notebook.notebook_id, "chunks": len(chunks), "doc_id": doc.doc_id}
 
 
 @app.post("/api/upload/url")
@@ -149,7 +277,7 @@ async def upload_url(
     # 1. Find or create notebook
     notebook = None
     if notebook_id:
-        notebook = db.query(Notebook).filter(Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id).first()
+        notebook = get_owned_notebook(db, notebook_id, hf_user_id)
         if not notebook:
             raise HTTPException(status_code=404, detail="Notebook ID provided but not found.")
     elif notebook_name:
@@ -157,83 +285,129 @@ async def upload_url(
         if not notebook:
             notebook = Notebook(notebook_id=str(uuid.uuid4()), hf_user_id=hf_user_id, title=notebook_name)
             db.add(notebook)
-            db.commit()
+            # Flush only: the notebook is committed together with its first document
+            db.flush()
     else:
         raise HTTPException(status_code=400, detail="Must provide either notebook_name or notebook_id")
 
     # 2. Extract Raw Text & Vectorize
     try:
-        raw_text = ingest_source("url", url)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch or parse URL: {e}")
-        
-    if not raw_text or len(raw_text.strip()) < 50:
-         raise HTTPException(status_code=400, detail="Could not extract enough text from URL.")
-
-    chunks = chunk_text(raw_text)
-    
-    # 3. Store Vectors in specific Chromadb folder
-    chroma_dir = get_chroma_db_dir(hf_user_id, notebook.notebook_id)
-    vstore = VectorStore(chroma_dir)
-    vstore.add_chunks(chunks, source_filename=url)
-
-    # 4. Save metadata to DB
-    doc = Document(
-        doc_id=str(uuid.uuid4()),
-        notebook_id=notebook.notebook_id,
-        filename=url,
-        file_type="url",
-        chunk_count=len(chunks)
-    )
-    db.add(doc)
-    db.commit()
+        try:
+            # Network-bound, so the threadpool is enough
+            raw_text = await run_in_threadpool(ingest_source, "url", url)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to fetch or parse URL: {e}")
+
+        if not raw_text or len(raw_text.strip()) < 50:
+             raise HTTPException(status_code=400, detail="Could not extract enough text from URL.")
+
+        chunks = dedupe_chunks(chunk_text(raw_text))
+
+        # 3. Store Vectors in specific Chromadb folder
+        chroma_dir = get_chroma_db_dir(hf_user_id, notebook.notebook_id)
+        vstore = get_vector_store(chroma_dir)
+        await run_in_threadpool(vstore.add_chunks, chunks, source_filename=url)
+
+        # 4. Save metadata to DB, keeping the extracted text for artifact generation
+        doc = Document(
+            doc_id=str(uuid.uuid4()),
+            notebook_id=notebook.notebook_id,
+            filename=url,
+            file_type="url",
+            chunk_count=len(chunks),
+            word_count=count_words(raw_text),
+        )
+        await run_in_threadpool(save_extracted_text, hf_user_id, notebook.notebook_id, doc.doc_id, raw_text)
+        db.add(doc)
+        # New sources make every stored artifact stale; deleted in the same commit as the Document
+        db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id).delete(synchronize_session=False)
+        await run_in_threadpool(commit_session, db)
+    except Exception:
+        # A failed fetch/embed must not leave a half-created notebook behind
+        db.rollback()
+        raise
 
     # 5. Save a placeholder so it shows up in "Files Currently in Notebook"
     # Convert things like https://www.speedtest.net/ to a safe filename
     import urllib.parse
     safe_name = urllib.parse.quote_plus(url)[:50] + ".url.txt"
-    save_raw_file(hf_user_id, notebook.notebook_id, safe_name, url.encode('utf-8'))
+    await run_in_threadpool(save_raw_file, hf_user_id, notebook.notebook_id, safe_name, url.encode('utf-8'))
+    chat_cache.invalidate((hf_user_id, notebook.notebook_id))
+    artifact_cache.invalidate_prefix((hf_user_id, notebook.notebook_id))
 
     return {"status": "success", "notebook_id": notebook.notebook_id, "chunks": len(chunks)}
 
 
-from pydantic import BaseModel
 class ChatRequest(BaseModel):
     notebook_id: str
     message: str
 
+def _finish_chat_turn(hf_user_id: str, notebook_id: str, message: str, tokens: list, q_emb, results, from_cache: bool):
+    """Runs after the streamed reply is sent: logs both turns and caches the answer."""
+    full_response = "".join(tokens)
+    db = SessionLocal()
+    try:
+        # One executemany INSERT for both turns (same row shape as core.chat_buffer)
+        db.execute(insert(ChatMessage), [
+            {"message_id": str(uuid.uuid4()), "notebook_id": notebook_id, "role": role, "content": content,
+             "created_at": datetime.now(timezone.utc)}
+            for role, content in (("user", message), ("assistant", full_response))
+        ])
+        # Behind WRITE_LOCK like every other background writer in this process
+        commit_session(db)
+    finally:
+        db.close()
+
+    if not from_cache and full_response and not is_rate_limit_message(full_response):
+        chat_cache.store((hf_user_id, notebook_id), q_emb, results, full_response)
+
+def _owned_chat_history(db: Session, notebook_id: str, hf_user_id: str) -> Optional[list]:
+    """The notebook's history as role/content dicts (no ChatMessage objects), or None if it isn't hf_user_id's."""
+    if not get_owned_notebook(db, notebook_id, hf_user_id):
+        return None
+    return get_chat_history(db, notebook_id)
+
 @app.post("/api/chat")
-def chat(request: ChatRequest, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
-    """Handles chat request, verifies ownership, vectors searches, and asks LLM"""
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
+    """
+    Handles chat request, verifies ownership, vectors searches, and asks LLM.
+    The reply is streamed as server-sent events: one `data: {"token": ...}` event per token.
+    """
     
-    # Verify Notebook Ownership
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == request.notebook_id, Notebook.hf_user_id == hf_user_id).first()
-    if not notebook:
+    # Ownership check + history are blocking SQLite calls, so they run off the event loop
+    history = await run_in_threadpool(_owned_chat_history, db, request.notebook_id, hf_user_id)
+    if history is None:
         raise HTTPException(status_code=404, detail="Notebook not found or unauthorized")
-
-    # Fetch History from DB to build prompt
-    history_records = db.query(ChatMessage).filter(ChatMessage.notebook_id == request.notebook_id).order_by(ChatMessage.created_at).all()
-    history = [{"role": msg.role, "content": msg.content} for msg in history_records]
     
     # Connect to vector store
     chroma_dir = get_chroma_db_dir(hf_user_id, request.notebook_id)
-    vstore = VectorStore(chroma_dir)
-    
-    from features.chat import build_rag_messages
-    from core.groq_client import groq_stream
+    vstore = await run_in_threadpool(get_vector_store, chroma_dir)
     
-    messages = build_rag_messages(request.message, vstore, history)
-    
-    full_response = ""
-    for token in groq_stream(messages, temperature=0.6, max_tokens=2048):
-        full_response += token
+    # Reuse the answer of a near-identical recent question instead of searching + calling the LLM
+    q_emb = await run_in_threadpool(vstore.embed, request.message)
+    cached = chat_cache.lookup((hf_user_id, request.notebook_id), q_emb)
+    results = None
+    if cached:
+        async def token_source():
+            yield cached.response
+        tokens_in = token_source()
+    else:
+        results = await run_in_threadpool(retrieve_context, request.message, vstore, query_embedding=q_emb, history=history)
+        messages = build_rag_messages(request.message, vstore, history, results=results)
+        tokens_in = groq_astream(messages, temperature=0.6, max_tokens=2048)
 
-    # Log new messages to database
-    db.add(ChatMessage(message_id=str(uuid.uuid4()), notebook_id=request.notebook_id, role="user", content=request.message))
-    db.add(ChatMessage(message_id=str(uuid.uuid4()), notebook_id=request.notebook_id, role="assistant", content=full_response))
-    db.commit()
+    tokens = []
 
-    return {"response": full_response}
+    async def event_stream():
+        async for token in tokens_in:
+            tokens.append(token)
+            yield f"data: {orjson.dumps({'token': token}).decode()}\n\n"
+
+    # Persisting after the last token keeps the DB commit off the streaming path
+    background_tasks.add_task(
+        _finish_chat_turn, hf_user_id, request.notebook_id, request.message, tokens, q_emb, results, cached is not None
+    )
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 class RenameRequest(BaseModel):
     notebook_id: str
@@ -242,27 +416,28 @@ class RenameRequest(BaseModel):
 @app.post("/api/notebooks/rename")
 def rename_notebook(request: RenameRequest, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
     """Renames an existing notebook"""
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == request.notebook_id, Notebook.hf_user_id == hf_user_id).first()
+    notebook = get_owned_notebook(db, request.notebook_id, hf_user_id)
     if not notebook:
         raise HTTPException(status_code=404, detail="Notebook not found or unauthorized")
         
     notebook.title = request.new_title
-    db.commit()
+    commit_session(db)
+    artifact_cache.invalidate_prefix((hf_user_id, request.notebook_id))
     return {"status": "success", "new_title": notebook.title}
 
 @app.delete("/api/notebooks/{notebook_id}")
 def delete_notebook(notebook_id: str, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
     """Deletes an existing notebook, including all its database objects and persistent files"""
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id).first()
-    if not notebook:
+    # Ownership check and delete in one statement; related rows go with bulk DELETEs, nothing is loaded
+    if not delete_notebooks(db, Notebook.notebook_id == notebook_id, Notebook.hf_user_id == hf_user_id):
         raise HTTPException(status_code=404, detail="Notebook not found or unauthorized")
-        
-    # Delete from database (cascade handles related objects)
-    db.delete(notebook)
-    db.commit()
+    commit_session(db)
     
     # Delete from filesystem (ChromaDB, raw files, extractions)
+    evict_vector_store(get_chroma_db_dir(hf_user_id, notebook_id))
     delete_notebook_storage(hf_user_id, notebook_id)
+    chat_cache.invalidate((hf_user_id, notebook_id))
+    artifact_cache.invalidate_prefix((hf_user_id, notebook_id))
     
     return {"status": "success", "message": "Notebook deleted"}
 
@@ -271,51 +446,82 @@ class GenerateRequest(BaseModel):
     artifact_type: str
     params: dict = {}
 
+PODCAST_AUDIO_FILE = "podcast.mp3"
+
+def _podcast_audio_path(db: Session, hf_user_id: str, notebook_id: str, content: str) -> Optional[str]:
+    """
+    Notebook-relative path of a stored podcast MP3, or None if it is gone.
+    Rows written by older versions hold base64 audio: those are moved onto disk on first read.
+    """
+    if content.endswith(".mp3"):
+        return content if resolve_notebook_path(hf_user_id, notebook_id, content) else None
+
+    import base64
+    try:
+        audio_bytes = base64.b64decode(content)
+    except Exception as e:
+        print("Failed to decode cached audio:", e)
+        return None
+    rel_path = save_artifact_file(hf_user_id, notebook_id, PODCAST_AUDIO_FILE, audio_bytes)
+    upsert_artifact(db, notebook_id, "podcast_audio", rel_path)
+    commit_session(db)
+    return rel_path
+
+def _artifact_response(artifact_type: str, content: str):
+    """Shapes stored artifact content the way /api/generate returns it."""
+    if artifact_type in ["podcast_script", "quiz"]:
+        return orjson.loads(content)
+    return {"result": content}
+
 @app.post("/api/generate")
 async def generate_artifact(request: GenerateRequest, hf_user_id: str = Depends(verify_hf_user), db: Session = Depends(get_db)):
-    """Handles async generation of Summaries, Podcasts, Quizzes, and Study Guides from the full notebook text"""
+    """
+    Handles async generation of Summaries, Podcasts, Quizzes, and Study Guides from the full notebook text.
+    The blocking Groq calls run in the threadpool so the event loop keeps serving other requests.
+    """
     
     if request.artifact_type == "podcast_audio":
-        from features.podcast import generate_podcast_audio
-        from fastapi.responses import Response
-        import base64
+        from features.podcast import build_podcast_audio
         
-        # Audio generation just takes the parsed lines directly, it doesn't need to read the notebook from DB
+        # Audio generation just takes the parsed lines directly, it doesn't need to read the notebook text
         parsed_lines = request.params.get("parsed_lines")
         if not parsed_lines:
             raise HTTPException(status_code=400, detail="parsed_lines required for audio generation")
+
+        # The MP3 lives under this user's notebook dir, so make sure the notebook is theirs
+        if not get_owned_notebook(db, request.notebook_id, hf_user_id):
+            raise HTTPException(status_code=404, detail="Notebook not found or unauthorized")
             
         # Check if we already have the audio synthesized for this specific notebook
         # Note: In a real app we might hash the transcript to detect changes, 
         # but for this portfolio piece mapping explicitly to notebook_id is fine.
-        existing_audio = db.query(Artifact).filter(Artifact.notebook_id == request.notebook_id, Artifact.artifact_type == "podcast_audio").first()
-        if existing_audio:
-            try:
-                # Return the decoded bytes natively
-                audio_bytes = base64.b64decode(existing_audio.content)
-                return Response(content=audio_bytes, media_type="audio/mpeg")
-            except Exception as e:
-                print("Failed to decode cached audio:", e)
+        mem_key = (hf_user_id, request.notebook_id, "podcast_audio")
+        rel_path = artifact_cache.get(mem_key)
+        path = rel_path and resolve_notebook_path(hf_user_id, request.notebook_id, rel_path)
+        if path:
+            return FileResponse(path, media_type="audio/mpeg")
+
+        existing_audio = get_artifact_content(db, request.notebook_id, "podcast_audio")
+        rel_path = existing_audio and await run_in_threadpool(_podcast_audio_path, db, hf_user_id, request.notebook_id, existing_audio)
+        if rel_path:
+            artifact_cache.set(mem_key, rel_path)
+            return FileResponse(resolve_notebook_path(hf_user_id, request.notebook_id, rel_path), media_type="audio/mpeg")
         
-        audio_bytes = await generate_podcast_audio(parsed_lines)
+        # TTS + MP3 encode block for the whole episode; keep them off the event loop
+        audio_bytes = await run_in_threadpool(build_podcast_audio, parsed_lines)
         
-        # Save securely mapped to the user's notebook in SQLite using Base64
-        base64_audio = base64.b64encode(audio_bytes).decode('utf-8')
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=request.notebook_id, artifact_type="podcast_audio", content=base64_audio))
+        # Keep the MP3 on disk and only its notebook-relative path in SQLite
+        rel_path = await run_in_threadpool(save_artifact_file, hf_user_id, request.notebook_id, PODCAST_AUDIO_FILE, audio_bytes)
         try:
-            db.commit()
+            upsert_artifact(db, request.notebook_id, "podcast_audio", rel_path)
+            await run_in_threadpool(commit_session, db)
         except BaseException as e:
             db.rollback()
             print("Failed caching audio to DB:", str(e))
+        artifact_cache.set(mem_key, rel_path)
         
-        return Response(content=audio_bytes, media_type="audio/mpeg")
+        return FileResponse(resolve_notebook_path(hf_user_id, request.notebook_id, rel_path), media_type="audio/mpeg")
 
-    # Verify Notebook Ownership
-    notebook = db.query(Notebook).filter(Notebook.notebook_id == request.notebook_id, Notebook.hf_user_id == hf_user_id).first()
-    if not notebook:
-        raise HTTPException(status_code=404, detail="Notebook not found or unauthorized")
-        
-    # Check if Artifact is already cached in database
     # For parameterized types (like modes), we append the param to the artifact_type for caching uniqueness
     cache_key = request.artifact_type
     if request.artifact_type == "summary":
@@ -324,56 +530,83 @@ async def generate_artifact(request: GenerateRequest, hf_user_id: str = Depends(
         cache_key += f"_{request.params.get('num_exchanges', 12)}"
     elif request.artifact_type == "quiz":
         cache_key += f"_{request.params.get('num_questions', 5)}"
+
+    # Hot path: entries are only stored after this user's ownership check passed, so a hit needs no DB round-trip
+    mem_key = (hf_user_id, request.notebook_id, cache_key)
+    cached_content = artifact_cache.get(mem_key)
+    if cached_content is not None:
+        return _artifact_response(request.artifact_type, cached_content)
+
+    # Verify Notebook Ownership
+    notebook = get_owned_notebook(db, request.notebook_id, hf_user_id, selectinload(Notebook.documents))
+    if not notebook:
+        raise HTTPException(status_code=404, detail="Notebook not found or unauthorized")
         
-    existing_artifact = db.query(Artifact).filter(Artifact.notebook_id == request.notebook_id, Artifact.artifact_type == cache_key).first()
-    if existing_artifact:
+    # Check if Artifact is already cached in database (just this one content column)
+    existing_content = get_artifact_content(db, request.notebook_id, cache_key)
+    if existing_content is not None:
         # It's cached! Return it natively.
-        if request.artifact_type in ["podcast_script", "quiz"]:
-            return json.loads(existing_artifact.content)
-        return {"result": existing_artifact.content}
-
-    # Not cached. Reconstruct text by querying ChromaDB for all chunks
-    chroma_dir = get_chroma_db_dir(hf_user_id, request.notebook_id)
-    vstore = VectorStore(chroma_dir)
-    chunks = vstore.collection.get()["documents"]
+        artifact_cache.set(mem_key, existing_content)
+        return _artifact_response(request.artifact_type, existing_content)
+
+    # Not cached. Load the text extracted at ingest time
+    full_text = load_notebook_text(hf_user_id, request.notebook_id, [d.doc_id for d in notebook.documents])
+    if full_text is None:
+        # Sources ingested before extracted text was stored: reconstruct from ChromaDB chunks
+        chroma_dir = get_chroma_db_dir(hf_user_id, request.notebook_id)
+        vstore = get_vector_store(chroma_dir)
+        by_source = await run_in_threadpool(vstore.source_texts, " ")
+        # Backfilled per document, so the next generation reads the text files instead of Chroma
+        names = [d.filename for d in notebook.documents]
+        for d in notebook.documents:
+            unique = names.count(d.filename) == 1
+            if unique and d.filename in by_source and load_extracted_text(hf_user_id, request.notebook_id, d.doc_id) is None:
+                save_extracted_text(hf_user_id, request.notebook_id, d.doc_id, by_source[d.filename])
+        full_text = load_notebook_text(hf_user_id, request.notebook_id, [d.doc_id for d in notebook.documents])
+        if full_text is None:
+            full_text = " ".join(by_source.values())
     
-    if not chunks:
+    if not full_text:
         raise HTTPException(status_code=400, detail="Notebook has no processed text")
-        
-    full_text = " ".join(chunks)
 
     if request.artifact_type == "summary":
         from features.summarizer import summarize
         mode = request.params.get("mode", "Brief").lower()
-        res = summarize(full_text, mode=mode)
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=request.notebook_id, artifact_type=cache_key, content=res))
-        db.commit()
+        res = await run_in_threadpool(summarize, full_text, mode=mode)
+        upsert_artifact(db, request.notebook_id, cache_key, res)
+        await run_in_threadpool(commit_session, db)
+        artifact_cache.set(mem_key, res)
         return {"result": res}
         
     elif request.artifact_type == "podcast_script":
         from features.podcast import generate_podcast_script, parse_podcast_script
         num_exchanges = int(request.params.get("num_exchanges", 12))
-        script_md = generate_podcast_script(full_text, num_exchanges)
+        script_md = await run_in_threadpool(generate_podcast_script, full_text, num_exchanges)
         parsed_lines = parse_podcast_script(script_md)
         out_dict = {"script": script_md, "parsed_lines": parsed_lines}
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=request.notebook_id, artifact_type=cache_key, content=json.dumps(out_dict)))
-        db.commit()
+        content = orjson.dumps(out_dict).decode()
+        upsert_artifact(db, request.notebook_id, cache_key, content)
+        await run_in_threadpool(commit_session, db)
+        artifact_cache.set(mem_key, content)
         return out_dict
         
     elif request.artifact_type == "quiz":
         from features.quiz import generate_quiz
         num_questions = int(request.params.get("num_questions", 5))
-        quiz_data = generate_quiz(full_text, num_questions)
+        quiz_data = await run_in_threadpool(generate_quiz, full_text, num_questions)
         out_dict = {"quiz": quiz_data}
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=request.notebook_id, artifact_type=cache_key, content=json.dumps(out_dict)))
-        db.commit()
+        content = orjson.dumps(out_dict).decode()
+        upsert_artifact(db, request.notebook_id, cache_key, content)
+        await run_in_threadpool(commit_session, db)
+        artifact_cache.set(mem_key, content)
         return out_dict
         
     elif request.artifact_type == "study_guide":
         from features.study_guide import generate_study_guide
-        study_guide = generate_study_guide(full_text)
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=request.notebook_id, artifact_type=cache_key, content=study_guide))
-        db.commit()
+        study_guide = await run_in_threadpool(generate_study_guide, full_text)
+        upsert_artifact(db, request.notebook_id, cache_key, study_guide)
+        await run_in_threadpool(commit_session, db)
+        artifact_cache.set(mem_key, study_guide)
         return {"result": study_guide}
         
     raise HTTPException(status_code=400, detail="Unknown artifact type")
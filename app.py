@@ -5,35 +5,72 @@ Gradio interface with HuggingFace OAuth and SQLite persistence.
 import fix_gradio  # patches gradio_client bug
 import gradio as gr
 import os
+import sys
+import signal
+import asyncio
 import json
+import orjson
 import uuid
+import hashlib
 import tempfile
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, selectinload
 
 load_dotenv()
 
 # Internal Modules
-from core.database import SessionLocal, Notebook, Document, Artifact, ChatMessage
+from core.database import (
+    SessionLocal, ReadSessionLocal, Notebook, Document, Artifact,
+    get_owned_notebook, get_artifact_content, upsert_artifact, commit_session, delete_notebooks,
+    get_chat_history, backfill_chunk_count,
+)
 from core.storage_manager import (
     save_raw_file, 
+    copy_raw_file,
+    save_extracted_text,
+    load_extracted_text,
+    load_notebook_text,
     get_chroma_db_dir, 
     delete_notebook_storage, 
-    get_notebook_subdir
+    get_notebook_subdir,
+    get_notebook_dir,
+    save_artifact_file,
+    resolve_notebook_path,
 )
 from core.ingestion import ingest_source
-from core.chunker import chunk_text
-from core.vector_store import VectorStore
-from core.groq_client import groq_stream
+from core.chunker import chunk_text, count_words, dedupe_chunks
+from core.embedder import warmup
+from core.vector_store import get_vector_store, evict_vector_store
+from core.groq_client import groq_stream, is_rate_limit_message
+from core.semantic_cache import SemanticCache
+from core.chat_buffer import chat_buffer
 
 # Features
 from features.summarizer import summarize
-from features.chat import build_rag_messages
-from features.podcast import generate_podcast_script, parse_podcast_script, generate_podcast_audio
-from features.quiz import generate_quiz, check_answer
+from features.chat import build_rag_messages, retrieve_context
+from features.podcast import generate_podcast_script, parse_podcast_script, iter_podcast_audio
+from features.quiz import generate_quiz, answer_letter
 from features.study_guide import generate_study_guide
 
 MAX_QUIZ_Q = 10
+# Worker processes for multi-file uploads (0 = one per CPU); PDF/PPTX parsing holds the GIL, so threads barely overlap
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "0")) or os.cpu_count()
+# Generate the brief summary + study guide in the background after ingest, so the first click is a cache hit
+PREWARM_ARTIFACTS = os.environ.get("PREWARM_ARTIFACTS", "1") == "1"
+
+# Gradio queue: LLM-backed handlers share QUEUE_CONCURRENCY workers; chat gets a tighter limit of its own
+QUEUE_CONCURRENCY = int(os.environ.get("QUEUE_CONCURRENCY", "8"))
+QUEUE_MAX_SIZE = int(os.environ.get("QUEUE_MAX_SIZE", "64"))
+CHAT_CONCURRENCY = int(os.environ.get("CHAT_CONCURRENCY", "4"))
+# Podcast TTS renders run in a background pool of this size, not on Gradio workers
+AUDIO_CONCURRENCY = int(os.environ.get("AUDIO_CONCURRENCY", "2"))
+# How often the Podcast tab checks on a running render
+AUDIO_POLL_SECS = float(os.environ.get("AUDIO_POLL_SECS", "2"))
 
 # ══════════════════════════════════════════════════════════════
 # DATABASE UTILS
@@ -47,28 +84,86 @@ def get_db():
         db.close()
         raise
 
+def get_db_read():
+    """Session on the query-only pool, for handlers that never write."""
+    return ReadSessionLocal()
+
 # ══════════════════════════════════════════════════════════════
 # NOTEBOOK MANAGEMENT
 # ══════════════════════════════════════════════════════════════
 
 def fetch_notebooks(profile: gr.OAuthProfile | None):
     if not profile:
-        return gr.Dropdown(choices=[], value=None)
-    db = get_db()
+        return gr.update(choices=[], value=None)
+    db = get_db_read()
     try:
-        notebooks = db.query(Notebook).filter(Notebook.hf_user_id == profile.username).order_by(Notebook.created_at.desc()).all()
+        notebooks = db.query(Notebook.notebook_id, Notebook.title).filter(Notebook.hf_user_id == profile.username).order_by(Notebook.created_at.desc()).all()
         choices = [nb.title for nb in notebooks]
-        return gr.Dropdown(choices=choices, value=choices[0] if choices else None)
+        if notebooks:
+            # The first notebook is selected by default, so open its store while the UI renders
+            threading.Thread(target=_prewarm_notebook, args=(profile.username, notebooks[0].notebook_id), daemon=True).start()
+        return gr.update(choices=choices, value=choices[0] if choices else None)
     finally:
         db.close()
 
-def process_source(notebook_name, source_type, file_obj, url_text, is_append, profile: gr.OAuthProfile | None):
+def _prewarm_notebook(hf_user_id, nb_id):
+    """Background thread: embedding model, Chroma client and exact index ready before the first chat."""
+    try:
+        warmup()  # cheap once _warmup_embedder has loaded the weights
+        get_vector_store(get_chroma_db_dir(hf_user_id, nb_id)).warm()
+    except Exception as e:
+        print(f"[ThinkBook] Notebook pre-warm failed for {nb_id}: {e}")
+
+def _warmup_embedder():
+    """Background thread at startup: model weights are loaded before the first user even logs in."""
+    try:
+        warmup()
+        print("[ThinkBook] Embedding model ready")
+    except Exception as e:
+        print(f"[ThinkBook] Embedding model warmup failed: {e}")
+
+def _file_type(path):
+    fname = path.lower()
+    return "pdf" if fname.endswith(".pdf") else ("pptx" if fname.endswith((".pptx", ".ppt")) else "txt")
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool():
+    """Created on the first multi-file upload and kept for the life of the app."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn, not fork: workers must not inherit the loaded torch model or open SQLite handles
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+def _extract_files(files):
+    """
+    Parses uploads straight from their temp paths, one worker process per file when there are several.
+    Returns [(path, ftype, text)]; text is None for a file that failed.
+    """
+    jobs = [(f.name, _file_type(f.name)) for f in files]
+    # A single file is parsed inline; spinning up workers would cost more than it saves
+    pool = _get_parse_pool() if len(jobs) > 1 else None
+    futures = [pool.submit(ingest_source, ftype, path) if pool else None for path, ftype in jobs]
+    extracted = []
+    for (path, ftype), fut in zip(jobs, futures):
+        try:
+            text = fut.result() if fut else ingest_source(ftype, path)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            text = None
+        extracted.append((path, ftype, text))
+    return extracted
+
+def process_source(notebook_name, source_type, file_obj, url_text, is_append, profile: gr.OAuthProfile | None, progress=None):
     if not profile:
-        return "❌ Please log in with Hugging Face first.", gr.Dropdown()
+        return "❌ Please log in with Hugging Face first.", gr.update()
     
     name = notebook_name.strip()
     if not name:
-        return "❌ Please enter a notebook name.", gr.Dropdown()
+        return "❌ Please enter a notebook name.", gr.update()
     
     db = get_db()
     try:
@@ -76,126 +171,178 @@ def process_source(notebook_name, source_type, file_obj, url_text, is_append, pr
         notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == name).first()
         if is_append:
             if not notebook:
-                return f"❌ '{name}' does not exist. Cannot append.", gr.Dropdown()
+                return f"❌ '{name}' does not exist. Cannot append.", gr.update()
             nb_id = notebook.notebook_id
         else:
             if notebook:
-                return f"❌ '{name}' already exists. Use a different name.", gr.Dropdown()
+                return f"❌ '{name}' already exists. Use a different name.", gr.update()
             # Create Notebook Record
             nb_id = str(uuid.uuid4())
             notebook = Notebook(notebook_id=nb_id, hf_user_id=profile.username, title=name)
             db.add(notebook)
-            db.commit()
+            commit_session(db)
 
         # Process Content
-        all_text = []
-        source_name = ""
+        sources = []  # (Document, extracted text)
 
         if source_type == "Files (PDF / PPTX / TXT)":
             if not file_obj:
-                return "❌ Please upload at least one file.", gr.Dropdown()
+                return "❌ Please upload at least one file.", gr.update()
             files = file_obj if isinstance(file_obj, list) else [file_obj]
-            for f in files:
+            # Files are independent, so they are parsed in parallel; DB + disk writes stay on this thread
+            for path, ftype, text in _extract_files(files):
                 try:
-                    fname = f.name.lower()
-                    ftype = "pdf" if fname.endswith(".pdf") else ("pptx" if fname.endswith((".pptx", ".ppt")) else "txt")
-                    with open(f.name, "rb") as fh:
-                        raw_bytes = fh.read()
-                    text = ingest_source(ftype, raw_bytes)
                     if text and len(text.strip()) > 20:
-                        all_text.append(text)
                         # Save metadata
-                        doc = Document(doc_id=str(uuid.uuid4()), notebook_id=nb_id, filename=os.path.basename(f.name), file_type=ftype)
-                        db.add(doc)
-                        save_raw_file(profile.username, nb_id, os.path.basename(f.name), raw_bytes)
+                        doc = Document(doc_id=str(uuid.uuid4()), notebook_id=nb_id, filename=os.path.basename(path), file_type=ftype,
+                                       word_count=count_words(text))
+                        sources.append((doc, text))
+                        # Keep the text on disk so generation never rebuilds it from Chroma
+                        save_extracted_text(profile.username, nb_id, doc.doc_id, text)
+                        copy_raw_file(profile.username, nb_id, os.path.basename(path), path)
                 except Exception as e:
-                    print(f"Skipping {f.name}: {e}")
-            source_name = "Uploaded Files"
+                    print(f"Skipping {path}: {e}")
         else:
             if not url_text.strip():
-                return "❌ Please enter a URL.", gr.Dropdown()
+                return "❌ Please enter a URL.", gr.update()
             raw_text = ingest_source("url", url_text.strip())
             if raw_text:
-                all_text.append(raw_text)
-                doc = Document(doc_id=str(uuid.uuid4()), notebook_id=nb_id, filename=url_text.strip(), file_type="url")
-                db.add(doc)
+                doc = Document(doc_id=str(uuid.uuid4()), notebook_id=nb_id, filename=url_text.strip(), file_type="url",
+                               word_count=count_words(raw_text))
+                sources.append((doc, raw_text))
+                save_extracted_text(profile.username, nb_id, doc.doc_id, raw_text)
                 save_raw_file(profile.username, nb_id, "source_url.txt", url_text.strip().encode())
-            source_name = url_text.strip()
 
-        combined_text = "\n\n---\n\n".join(all_text)
-        if not combined_text or len(combined_text.strip()) < 50:
+        if sum(len(text.strip()) for _doc, text in sources) < 50:
             if not is_append:
                 db.delete(notebook)
-                db.commit()
-            return "❌ Could not extract enough text.", gr.Dropdown()
+                commit_session(db)
+                delete_notebook_storage(profile.username, nb_id)
+            return "❌ Could not extract enough text.", gr.update()
 
-        # Vectorize
-        chunks = chunk_text(combined_text)
+        # Vectorize: chunk each source on its own, so no chunk spans two documents,
+        # then embed + insert the whole upload in one windowed call tagged per file
+        chunks, chunk_sources = [], []
+        seen = set()  # shared, so a chunk repeated across files of this upload is stored once
+        for doc, text in sources:
+            doc_chunks = dedupe_chunks(chunk_text(text), seen)
+            doc.chunk_count = len(doc_chunks)
+            chunks.extend(doc_chunks)
+            chunk_sources.extend([doc.filename] * len(doc_chunks))
+        # Added together once chunk_count is known, so the flush is one batched INSERT with final values
+        db.add_all([doc for doc, _text in sources])
         chroma_dir = get_chroma_db_dir(profile.username, nb_id)
-        store = VectorStore(chroma_dir)
-        store.add_chunks(chunks, source_filename=source_name)
+        store = get_vector_store(chroma_dir)
+        on_progress = (lambda done, total: progress(done / total, desc=f"Embedding {done}/{total} chunks")) if progress else None
+        store.add_chunks(chunks, sources=chunk_sources, on_progress=on_progress)
         
-        db.commit()
+        if is_append:
+            # New sources make every cached artifact stale. Deleted only now, right before the commit,
+            # so the SQLite write lock isn't held through extraction and embedding.
+            db.query(Artifact).filter(Artifact.notebook_id == nb_id).delete(synchronize_session=False)
+        commit_session(db)
+        # Answers cached before this upload didn't see the new sources
+        chat_cache.invalidate((profile.username, nb_id))
+        if PREWARM_ARTIFACTS:
+            threading.Thread(target=_prewarm_artifacts, args=(profile.username, nb_id), daemon=True).start()
         
         # Refresh list
-        notebooks = db.query(Notebook).filter(Notebook.hf_user_id == profile.username).order_by(Notebook.created_at.desc()).all()
-        choices = [nb.title for nb in notebooks]
+        choices = _notebook_titles(db, profile.username)
         action = "appended to" if is_append else "added!"
-        return f"✅ **{name}** {action} {len(chunks)} chunks processed.", gr.Dropdown(choices=choices, value=name)
+        return f"✅ **{name}** {action} {len(chunks)} chunks processed.", gr.update(choices=choices, value=name)
     except Exception as e:
         db.rollback()
-        return f"❌ Error: {e}", gr.Dropdown()
+        return f"❌ Error: {e}", gr.update()
     finally:
         db.close()
 
+def _notebook_titles(db, hf_user_id):
+    """Dropdown choices, newest first: the title column only, straight off ix_notebook_user_created."""
+    rows = db.query(Notebook.title).filter(Notebook.hf_user_id == hf_user_id).order_by(Notebook.created_at.desc()).all()
+    return [title for (title,) in rows]
+
 def delete_notebook(notebook_name, profile: gr.OAuthProfile | None):
     if not profile or not notebook_name:
-        return gr.Dropdown(), "❌ Unauthorized."
+        return gr.update(), "❌ Unauthorized."
     db = get_db()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
-        if notebook:
-            nb_id = notebook.notebook_id
-            db.delete(notebook)
-            db.commit()
+        criteria = (Notebook.hf_user_id == profile.username, Notebook.title == notebook_name)
+        # Buffered chat rows go first, before the DELETEs open the write transaction:
+        # a flush waiting on that lock would otherwise still insert them for a notebook that is gone
+        reader = get_db_read()  # own session, so no read snapshot is open when this one starts writing
+        try:
+            for (nb_id,) in reader.query(Notebook.notebook_id).filter(*criteria).all():
+                chat_buffer.drop(nb_id)
+        finally:
+            reader.close()
+        # Children go with bulk DELETEs instead of being loaded for the cascade
+        nb_ids = delete_notebooks(db, *criteria)
+        commit_session(db)
+        for nb_id in nb_ids:
+            evict_vector_store(get_chroma_db_dir(profile.username, nb_id))
+            chat_cache.invalidate((profile.username, nb_id))
             delete_notebook_storage(profile.username, nb_id)
         
-        notebooks = db.query(Notebook).filter(Notebook.hf_user_id == profile.username).order_by(Notebook.created_at.desc()).all()
-        choices = [nb.title for nb in notebooks]
-        return gr.Dropdown(choices=choices, value=choices[0] if choices else None), "🗑️ Deleted."
+        choices = _notebook_titles(db, profile.username)
+        return gr.update(choices=choices, value=choices[0] if choices else None), "🗑️ Deleted."
     finally:
         db.close()
 
-def rename_notebook(old_name, new_name, profile: gr.OAuthProfile | None):
-    if not profile or not old_name:
-        return gr.Dropdown(), "❌ Unauthorized."
+def rename_notebook(old_name, nb_id, new_name, profile: gr.OAuthProfile | None):
+    if not profile or not old_name or not nb_id:
+        return gr.update(), gr.update(), "❌ Unauthorized."
     db = get_db()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == old_name).first()
-        if not notebook:
-            return gr.Dropdown(), "❌ Notebook not found."
-        notebook.title = new_name.strip()
-        db.commit()
+        # By id: titles aren't unique, so matching on the title alone would rename every notebook sharing it
+        renamed = db.execute(
+            update(Notebook)
+            .where(Notebook.hf_user_id == profile.username, Notebook.notebook_id == nb_id, Notebook.title == old_name)
+            .values(title=new_name.strip())
+            .returning(Notebook.notebook_id),
+            execution_options={"synchronize_session": False},
+        ).first()
+        if not renamed:
+            return gr.update(), gr.update(), "❌ Notebook not found."
+        commit_session(db)
         
-        notebooks = db.query(Notebook).filter(Notebook.hf_user_id == profile.username).order_by(Notebook.created_at.desc()).all()
-        choices = [nb.title for nb in notebooks]
-        return gr.Dropdown(choices=choices, value=new_name.strip()), gr.update(value=""), f"✅ Renamed to **{new_name.strip()}**"
+        choices = _notebook_titles(db, profile.username)
+        return gr.update(choices=choices, value=new_name.strip()), gr.update(value=""), f"✅ Renamed to **{new_name.strip()}**"
+    finally:
+        db.close()
+
+def _notebook_stats_md(nb_name, chunks, words):
+    # Both totals are summed from the per-document counts stored at ingest (legacy chunk counts are backfilled once); older notebooks have no word counts
+    return f"📊 **{nb_name}** · {chunks or 0} context chunks indexed{f' · {words:,} words' if words else ''}."
+
+def _chunk_total(hf_user_id, nb_id, chunks, doc_count):
+    """SUM(chunk_count) as is, unless the notebook predates stored counts: then Chroma is counted once and the total kept."""
+    if chunks or not doc_count:
+        return chunks or 0
+    db = get_db()
+    try:
+        total = backfill_chunk_count(db, nb_id, lambda: get_vector_store(get_chroma_db_dir(hf_user_id, nb_id)).collection.count())
+        commit_session(db)
+        return total
     finally:
         db.close()
 
 def get_notebook_info(notebook_name, profile: gr.OAuthProfile | None):
     if not profile or not notebook_name:
         return "_Please log in to see notebook stats_"
-    db = get_db()
+    db = get_db_read()
     try:
         notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
         if not notebook:
             return "_Notebook not found_"
         
-        chroma_dir = get_chroma_db_dir(profile.username, notebook.notebook_id)
-        store = VectorStore(chroma_dir)
-        count = store.collection.count()
-        return f"📊 **{notebook_name}** · {count} context chunks indexed."
+        # One SUM over documents instead of opening the Chroma collection just to count it
+        chunks, words, doc_count = (
+            db.query(func.sum(Document.chunk_count), func.sum(Document.word_count), func.count(Document.doc_id))
+            .filter(Document.notebook_id == notebook.notebook_id)
+            .one()
+        )
+        chunks = _chunk_total(profile.username, notebook.notebook_id, chunks, doc_count)
+        return _notebook_stats_md(notebook_name, chunks, words)
     finally:
         db.close()
 
@@ -203,161 +350,377 @@ def get_notebook_info(notebook_name, profile: gr.OAuthProfile | None):
 # CHAT
 # ══════════════════════════════════════════════════════════════
 
-def chat_response(message, history, notebook_name, profile: gr.OAuthProfile | None):
+# Re-render the chatbot at most this often while tokens stream in (the first token is shown right away)
+STREAM_FLUSH_SECS = 0.05
+
+def _stream_text(tokens):
+    """Yields the text accumulated so far at most every STREAM_FLUSH_SECS, and the full text last."""
+    parts = []
+    last_flush = 0.0
+    for token in tokens:
+        parts.append(token)
+        now = time.monotonic()
+        if now - last_flush >= STREAM_FLUSH_SECS:
+            last_flush = now
+            yield "".join(parts)
+    yield "".join(parts)
+
+# Near-identical questions per notebook reuse the earlier answer (no retrieval, no Groq call)
+chat_cache = SemanticCache(max_entries=128, threshold=0.97, ttl=3600)
+
+# Shown under answers served from chat_cache; display only, never stored or sent back to the model
+CACHED_MARKER = "\n\n_♻️ cached_"
+
+def _stored_chat_history(nb_id):
+    db = get_db_read()  # writes go through chat_buffer
+    try:
+        return get_chat_history(db, nb_id)
+    finally:
+        # Released before streaming: an open read snapshot would hold back WAL checkpoints for the whole reply
+        db.close()
+
+def _chat_history(nb_id):
+    """Stored plus still-buffered turns, read so a flush in between can't drop or repeat any."""
+    # Its own short session: a long-lived one's snapshot could predate a flush that already left the buffer
+    return chat_buffer.history(nb_id, _stored_chat_history)
+
+def _model_history(history):
+    """The chatbot history as the model should see it: cache hits round-trip through Gradio with CACHED_MARKER."""
+    return [
+        {"role": m["role"], "content": m["content"].removesuffix(CACHED_MARKER)}
+        if m["role"] == "assistant" and m["content"].endswith(CACHED_MARKER) else m
+        for m in history
+    ]
+
+def chat_response(message, history, nb_id, profile: gr.OAuthProfile | None):
     if not profile:
-        return history + [{"role": "assistant", "content": "❌ Please log in first."}], ""
-    if not notebook_name:
-        return history + [{"role": "assistant", "content": "❌ Select a notebook first."}], ""
+        yield history + [{"role": "assistant", "content": "❌ Please log in first."}], ""
+        return
+    if not nb_id:
+        yield history + [{"role": "assistant", "content": "❌ Select a notebook first."}], ""
+        return
     
-    db = get_db()
+    # Load history from DB if Gradio history is empty, plus turns not flushed yet
+    if not history:
+        history = _chat_history(nb_id)
+
+    chroma_dir = get_chroma_db_dir(profile.username, nb_id)
+    store = get_vector_store(chroma_dir)
+    
+    cache_ns = (profile.username, nb_id)
+    q_emb = store.embed(message)
+    cached = chat_cache.lookup(cache_ns, q_emb)
+    history.append({"role": "user", "content": message})
+    full_response = ""
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
-        if not notebook: return history, ""
-        
-        # Load history from DB if Gradio history is empty
-        if not history:
-            msgs = db.query(ChatMessage).filter(ChatMessage.notebook_id == notebook.notebook_id).order_by(ChatMessage.created_at).all()
-            history = [{"role": m.role, "content": m.content} for m in msgs]
+        if cached:
+            full_response = cached.response
+            history.append({"role": "assistant", "content": full_response + CACHED_MARKER})
+            yield history, ""
+        else:
+            past = _model_history(history[:-1])
+            results = retrieve_context(message, store, query_embedding=q_emb, history=past)
+            messages = build_rag_messages(message, store, past, results=results)
 
-        chroma_dir = get_chroma_db_dir(profile.username, notebook.notebook_id)
-        store = VectorStore(chroma_dir)
-        
-        messages = build_rag_messages(message, store, history)
-        full_response = ""
-        for token in groq_stream(messages):
-            full_response += token
-            
-        # Persistence
-        db.add(ChatMessage(message_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, role="user", content=message))
-        db.add(ChatMessage(message_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, role="assistant", content=full_response))
-        db.commit()
-        
-        history.append({"role": "user", "content": message})
-        history.append({"role": "assistant", "content": full_response})
-        return history, ""
+            # Show the reply as it streams; batching re-renders keeps Gradio from redrawing per token
+            history.append({"role": "assistant", "content": ""})
+            for full_response in _stream_text(groq_stream(messages)):
+                history[-1]["content"] = full_response
+                yield history, ""
+            if full_response and not is_rate_limit_message(full_response):
+                chat_cache.store(cache_ns, q_emb, results, full_response)
+    finally:
+        # Persistence: write-behind, the rows reach SQLite with the next batched flush.
+        # In a finally so a reply the user stopped mid-stream is still kept as far as it got.
+        if full_response:
+            chat_buffer.add(nb_id, "user", message)
+            chat_buffer.add(nb_id, "assistant", full_response)
+
+def _podcast_audio_file(hf_user_id, nb_id, lines_state):
+    """MP3 path for this exact script; a different script (e.g. more exchanges) gets its own file."""
+    # Stays on stdlib json: orjson's compact output would rename every MP3 already rendered
+    key = hashlib.blake2b(json.dumps(lines_state).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(get_notebook_subdir(hf_user_id, nb_id, os.path.join("artifacts", "audio")), f"{key}.mp3")
+
+def _stored_audio_path(hf_user_id, nb_id, content):
+    """
+    Absolute path of the stored podcast MP3, or None if it is gone.
+    Rows written by older versions hold base64 audio: those are moved onto disk once, on first load.
+    """
+    if content.endswith(".mp3"):
+        return resolve_notebook_path(hf_user_id, nb_id, content)
+
+    import base64
+    try:
+        rel_path = save_artifact_file(hf_user_id, nb_id, "podcast.mp3", base64.b64decode(content))
+    except Exception as e:
+        print(f"Error loading audio: {e}")
+        return None
+    db = get_db()  # callers hold a read-only session
+    try:
+        upsert_artifact(db, nb_id, "podcast_audio", rel_path)
+        commit_session(db)
     finally:
         db.close()
+    return resolve_notebook_path(hf_user_id, nb_id, rel_path)
 
-async def generate_audio_ui(lines_state, notebook_name, profile: gr.OAuthProfile | None):
-    if not lines_state or not profile or not notebook_name:
-        return None, "❌ Generate the podcast script first."
-    
-    db = get_db()
+def _migrate_legacy_audio():
+    """Background thread at startup: moves every base64 podcast row onto disk, so no notebook load has to."""
+    db = get_db_read()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
-        existing = db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id, Artifact.artifact_type == "podcast_audio").first()
-        
-        import base64
-        if existing:
-            audio_bytes = base64.b64decode(existing.content)
-        else:
-            audio_bytes = await generate_podcast_audio(lines_state)
-            base64_audio = base64.b64encode(audio_bytes).decode('utf-8')
-            db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, 
-                            artifact_type="podcast_audio", content=base64_audio))
-            db.commit()
-            
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        tmp.write(audio_bytes)
-        tmp.close()
-        return tmp.name, "✅ Audio ready!"
+        legacy = (
+            db.query(Notebook.hf_user_id, Artifact.notebook_id)
+            .join(Notebook, Notebook.notebook_id == Artifact.notebook_id)
+            .filter(Artifact.artifact_type == "podcast_audio", ~Artifact.content.like("%.mp3"))
+            .all()
+        )
+        for hf_user_id, nb_id in legacy:
+            # One row's audio in memory at a time
+            content = get_artifact_content(db, nb_id, "podcast_audio")
+            if content:
+                _stored_audio_path(hf_user_id, nb_id, content)
     except Exception as e:
-        return None, f"❌ Audio error: {e}"
+        print(f"[ThinkBook] Legacy audio migration failed: {e}")
+        return
     finally:
         db.close()
+    if legacy:
+        print(f"[ThinkBook] Moved {len(legacy)} legacy podcast audio rows to disk")
+
+# Renders keyed by their final MP3 path, so clicking twice (or from two tabs) shares one job
+_audio_pool = ThreadPoolExecutor(max_workers=AUDIO_CONCURRENCY, thread_name_prefix="tts")
+_audio_jobs = {}  # audio_path -> {"future": Future, "done": lines synthesized, "total": lines, "part_path": file being written}
+_audio_jobs_lock = threading.Lock()
+
+def _render_podcast_audio(job, hf_user_id, nb_id, lines_state, audio_path):
+    """Synthesizes the script line by line, renames the file into place and records it on the notebook."""
+    # Written next to the final file and renamed at the end, so a half-done file is never a cache hit
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(audio_path), prefix=".part-", suffix=".mp3", delete=False) as tmp:
+        job["part_path"] = tmp.name
+        try:
+            for chunk in iter_podcast_audio(lines_state):
+                tmp.write(chunk)
+                # Flushed per line: the poll timer hands out the partial file so playback can start early
+                tmp.flush()
+                job["done"] += 1
+        except Exception:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    os.replace(tmp.name, audio_path)
 
-def submit_quiz_ui(quiz_json, *answers):
+    # SQLite only keeps the notebook-relative path (same convention as the API), never the audio itself
+    rel_path = os.path.relpath(audio_path, get_notebook_dir(hf_user_id, nb_id))
+    db = get_db()
     try:
-        quiz = json.loads(quiz_json)
-    except:
+        upsert_artifact(db, nb_id, "podcast_audio", rel_path)
+        commit_session(db)
+    finally:
+        db.close()
+
+def _finish_audio_job(audio_path, future):
+    """Done callback: a finished render leaves _audio_jobs even if no timer tick ever comes for it."""
+    if not future.cancelled() and future.exception() is None:
+        with _audio_jobs_lock:
+            if _audio_jobs.get(audio_path, {}).get("future") is future:
+                del _audio_jobs[audio_path]
+    # Failed renders stay until check_audio_ui reports the error (or a new click replaces them)
+
+def generate_audio_ui(lines_state, nb_id, profile: gr.OAuthProfile | None):
+    """Starts (or joins) the background render and turns on the poll timer; returns right away."""
+    if not lines_state or not profile or not nb_id:
+        return None, "❌ Generate the podcast script first.", gr.Timer(active=False)
+
+    audio_path = _podcast_audio_file(profile.username, nb_id, lines_state)
+    if os.path.exists(audio_path):
+        # Same script as before: serve the file as-is, no TTS
+        return audio_path, "✅ Audio ready! (♻️ cached)", gr.Timer(active=False)
+
+    started = None
+    with _audio_jobs_lock:
+        running = _audio_jobs.get(audio_path)
+        # A failed render whose error nobody picked up yet is replaced by a fresh one
+        if running is None or running["future"].done():
+            job = {"done": 0, "total": len(lines_state)}
+            job["future"] = started = _audio_pool.submit(_render_podcast_audio, job, profile.username, nb_id, lines_state, audio_path)
+            _audio_jobs[audio_path] = job
+    if started is not None:
+        # Outside the lock: the callback takes it, and runs right here if the render already finished
+        started.add_done_callback(lambda fut: _finish_audio_job(audio_path, fut))
+    return None, "⏳ Generating Audio (may take a minute)...", gr.Timer(active=True)
+
+def check_audio_ui(lines_state, nb_id, profile: gr.OAuthProfile | None):
+    """Timer tick: progress while the render runs, the MP3 once it is done."""
+    if not lines_state or not profile or not nb_id:
+        return gr.update(), gr.update(), gr.Timer(active=False)
+
+    audio_path = _podcast_audio_file(profile.username, nb_id, lines_state)
+    job = _audio_jobs.get(audio_path)
+    if job and job["future"].done():
+        with _audio_jobs_lock:
+            _audio_jobs.pop(audio_path, None)
+        error = job["future"].exception()
+        if error:
+            return None, f"❌ Audio error: {error}", gr.Timer(active=False)
+    if os.path.exists(audio_path):
+        # The file lands just before the job finishes (the artifact row is written last); done with it either way
+        with _audio_jobs_lock:
+            if _audio_jobs.get(audio_path) is job:
+                _audio_jobs.pop(audio_path, None)
+        return audio_path, "✅ Audio ready!", gr.Timer(active=False)
+    if not job:
+        # Nothing running for this script (e.g. another notebook is selected now)
+        return gr.update(), gr.update(), gr.Timer(active=False)
+    status = f"🎙️ Synthesizing line {job['done']}/{job['total']}..."
+    # Lines land as bare MP3 frames, so the .part- file plays as-is; re-sent only when it grew
+    done, part_path = job["done"], job.get("part_path")
+    if done > job.get("shown", 0) and part_path and os.path.exists(part_path):
+        job["shown"] = done
+        return part_path, status, gr.Timer(active=True)
+    return gr.update(), status, gr.Timer(active=True)
+
+def submit_quiz_ui(quiz, *answers):
+    if not quiz:
         return "❌ No quiz loaded."
     
-    results = ""
+    # Grading is a plain letter compare (see check_answer), so do it in one pass over precomputed letters.
+    # New quizzes are stored normalized already; answer_letter() still covers ones cached by older versions
+    correct_letters = [answer_letter(q["answer"]) for q in quiz]
+    chosen = [answer_letter(a) if a else "" for a in answers[:len(quiz)]]
+    chosen += [""] * (len(quiz) - len(chosen))
+
+    parts = []
     correct_count = 0
-    for i, q in enumerate(quiz):
-        user_ans = answers[i] if i < len(answers) else ""
-        if not user_ans:
-            results += f"**Q{i+1}:** ⚠️ Not answered\n\n"
+    for i, (q, letter, correct) in enumerate(zip(quiz, chosen, correct_letters), 1):
+        if not letter:
+            parts.append(f"**Q{i}:** ⚠️ Not answered\n\n")
             continue
-        letter = user_ans[0] # Take first letter (A, B, C, or D)
-        is_correct, explanation = check_answer(q, letter)
-        if is_correct:
+        explanation = q.get("explanation", "")
+        if letter == correct:
             correct_count += 1
-            results += f"**Q{i+1}:** ✅ Correct! ({q['answer']})\n💡 _{explanation}_\n\n"
+            parts.append(f"**Q{i}:** ✅ Correct! ({q['answer']})\n💡 _{explanation}_\n\n")
         else:
-            results += f"**Q{i+1}:** ❌ Chose **{letter}**, correct: **{q['answer']}**\n💡 _{explanation}_\n\n"
+            parts.append(f"**Q{i}:** ❌ Chose **{letter}**, correct: **{q['answer']}**\n💡 _{explanation}_\n\n")
             
     pct = int((correct_count / len(quiz)) * 100)
-    results += f"\n---\n### Score: {correct_count}/{len(quiz)} ({pct}%)"
-    return results
+    parts.append(f"\n---\n### Score: {correct_count}/{len(quiz)} ({pct}%)")
+    return "".join(parts)
 
 def get_full_text(notebook):
+    # Text saved at ingest time, read only when a generator actually needs it
+    text = load_notebook_text(notebook.hf_user_id, notebook.notebook_id, [d.doc_id for d in notebook.documents])
+    if text is not None:
+        return text
+    # Sources ingested before extracted text was stored: rebuild from the Chroma chunks
     chroma_dir = get_chroma_db_dir(notebook.hf_user_id, notebook.notebook_id)
-    store = VectorStore(chroma_dir)
-    chunks = store.collection.get()["documents"]
-    return "\n\n".join(chunks)
+    store = get_vector_store(chroma_dir)
+    by_source = store.source_texts()
+    # ...and save it per document, so this notebook never goes back to Chroma for its text
+    names = [d.filename for d in notebook.documents]
+    for d in notebook.documents:
+        # A file name used twice can't be split back into its two uploads
+        unique = names.count(d.filename) == 1
+        if unique and d.filename in by_source and load_extracted_text(notebook.hf_user_id, notebook.notebook_id, d.doc_id) is None:
+            save_extracted_text(notebook.hf_user_id, notebook.notebook_id, d.doc_id, by_source[d.filename])
+    text = load_notebook_text(notebook.hf_user_id, notebook.notebook_id, [d.doc_id for d in notebook.documents])
+    return text if text is not None else "\n\n".join(by_source.values())
 
-def generate_summary_ui(notebook_name, mode, profile: gr.OAuthProfile | None):
-    if not profile or not notebook_name: return "❌ Unauthorized."
+def _prewarm_artifacts(hf_user_id, nb_id):
+    """Background thread: fills the artifact rows the UI reads, skipping any that already exist."""
+    db = get_db()
+    try:
+        notebook = get_owned_notebook(db, nb_id, hf_user_id, selectinload(Notebook.documents))
+        if not notebook:
+            return
+        text = get_full_text(notebook)
+        for cache_key, build in (
+            ("summary_brief", lambda: summarize(text, mode="brief")),
+            ("study_guide", lambda: generate_study_guide(text)),
+        ):
+            if get_artifact_content(db, nb_id, cache_key) is not None:
+                continue
+            res = build()
+            if is_rate_limit_message(res):
+                # Leave the rest for an on-demand click rather than burning more quota
+                return
+            upsert_artifact(db, nb_id, cache_key, res)
+            commit_session(db)
+        print(f"[ThinkBook] Pre-generated artifacts for notebook {nb_id}")
+    except Exception as e:
+        db.rollback()
+        print(f"[ThinkBook] Artifact pre-warm failed for notebook {nb_id}: {e}")
+    finally:
+        db.close()
+
+def _notebook_with_documents(db, nb_id, profile):
+    """Only needed when an artifact has to be generated: cache hits go straight to the Artifact row."""
+    return get_owned_notebook(db, nb_id, profile.username, selectinload(Notebook.documents))
+
+def generate_summary_ui(nb_id, mode, profile: gr.OAuthProfile | None):
+    if not profile or not nb_id:
+        yield "❌ Unauthorized."
+        return
     db = get_db()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
         cache_key = f"summary_{mode.lower()}"
-        existing = db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id, Artifact.artifact_type == cache_key).first()
-        if existing: return existing.content
+        existing = get_artifact_content(db, nb_id, cache_key)
+        if existing is not None:
+            yield existing
+            return
         
-        text = get_full_text(notebook)
-        res = summarize(text, mode=mode.lower())
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, artifact_type=cache_key, content=res))
-        db.commit()
-        return res
+        text = get_full_text(_notebook_with_documents(db, nb_id, profile))
+        res = ""
+        for res in _stream_text(summarize(text, mode=mode.lower(), stream=True)):
+            yield res
+        res = res.strip()
+        if res and not is_rate_limit_message(res):
+            # Upsert: the pre-warm thread may have written this row meanwhile
+            upsert_artifact(db, nb_id, cache_key, res)
+            commit_session(db)
     finally:
         db.close()
 
-def generate_podcast_ui(notebook_name, num_exchanges, profile: gr.OAuthProfile | None):
-    if not profile or not notebook_name: return "❌ Unauthorized.", None
+def generate_podcast_ui(nb_id, num_exchanges, profile: gr.OAuthProfile | None):
+    if not profile or not nb_id: return "❌ Unauthorized.", None
     db = get_db()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
         cache_key = f"podcast_script_{num_exchanges}"
-        existing = db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id, Artifact.artifact_type == cache_key).first()
+        existing = get_artifact_content(db, nb_id, cache_key)
         
-        if existing:
-            data = json.loads(existing.content)
+        if existing is not None:
+            data = orjson.loads(existing)
             script_md, lines = data["script"], data["lines"]
         else:
-            text = get_full_text(notebook)
+            text = get_full_text(_notebook_with_documents(db, nb_id, profile))
             script_md = generate_podcast_script(text, int(num_exchanges))
             lines = parse_podcast_script(script_md)
-            db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, 
-                            artifact_type=cache_key, content=json.dumps({"script": script_md, "lines": lines})))
-            db.commit()
+            # Upsert: Generate All and a tab click can both be building this row
+            upsert_artifact(db, nb_id, cache_key, orjson.dumps({"script": script_md, "lines": lines}).decode())
+            commit_session(db)
             
-        formatted = ""
-        for speaker, line in lines:
-            icon = "🎤" if speaker == "Alex" else "🎓"
-            formatted += f"{icon} **{speaker}:** {line}\n\n"
+        formatted = "".join(
+            f"{'🎤' if speaker == 'Alex' else '🎓'} **{speaker}:** {line}\n\n" for speaker, line in lines
+        )
         return formatted, lines
     finally:
         db.close()
 
-def gen_quiz_ui(notebook_name, num_q, profile: gr.OAuthProfile | None):
+def gen_quiz_ui(nb_id, num_q, profile: gr.OAuthProfile | None):
     empty = [gr.update(visible=False) for _ in range(MAX_QUIZ_Q)]
-    if not profile or not notebook_name: return ("❌ Login required", "[]", "", "", *empty)
+    if not profile or not nb_id: return ("❌ Login required", [], "", "", *empty)
     
     db = get_db()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
         cache_key = f"quiz_{num_q}"
-        existing = db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id, Artifact.artifact_type == cache_key).first()
+        existing = get_artifact_content(db, nb_id, cache_key)
         
-        if existing:
-            quiz = json.loads(existing.content)
+        if existing is not None:
+            quiz = orjson.loads(existing)
         else:
-            text = get_full_text(notebook)
+            text = get_full_text(_notebook_with_documents(db, nb_id, profile))
             quiz = generate_quiz(text, num_questions=int(num_q))
-            db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, artifact_type=cache_key, content=json.dumps(quiz)))
-            db.commit()
+            upsert_artifact(db, nb_id, cache_key, orjson.dumps(quiz).decode())
+            commit_session(db)
             
         radio_updates = []
         for i in range(MAX_QUIZ_Q):
@@ -366,34 +729,67 @@ def gen_quiz_ui(notebook_name, num_q, profile: gr.OAuthProfile | None):
                 radio_updates.append(gr.update(choices=[f"A: {q['options']['A']}", f"B: {q['options']['B']}", f"C: {q['options']['C']}", f"D: {q['options']['D']}"], value=None, visible=True))
             else:
                 radio_updates.append(gr.update(visible=False))
-        return ("✅ Quiz ready!", json.dumps(quiz), render_quiz_md(quiz), "", *radio_updates)
+        return ("✅ Quiz ready!", quiz, render_quiz_md(quiz), "", *radio_updates)
     finally:
         db.close()
 
 def render_quiz_md(quiz):
-    out = ""
+    parts = []
     for i, q in enumerate(quiz):
-        out += f"**Q{i+1}. {q['question']}**\n"
-        for l, opt in q['options'].items(): out += f"- **{l}:** {opt}\n"
-        out += "\n"
-    return out
+        parts.append(f"**Q{i+1}. {q['question']}**\n")
+        for l, opt in q['options'].items(): parts.append(f"- **{l}:** {opt}\n")
+        parts.append("\n")
+    return "".join(parts)
 
-def get_study_guide_ui(notebook_name, profile: gr.OAuthProfile | None):
-    if not profile or not notebook_name: return "❌ Unauthorized."
+def get_study_guide_ui(nb_id, profile: gr.OAuthProfile | None):
+    if not profile or not nb_id:
+        yield "❌ Unauthorized."
+        return
     db = get_db()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == notebook_name).first()
-        existing = db.query(Artifact).filter(Artifact.notebook_id == notebook.notebook_id, Artifact.artifact_type == "study_guide").first()
-        if existing: return existing.content
+        existing = get_artifact_content(db, nb_id, "study_guide")
+        if existing is not None:
+            yield existing
+            return
         
-        text = get_full_text(notebook)
-        res = generate_study_guide(text)
-        db.add(Artifact(artifact_id=str(uuid.uuid4()), notebook_id=notebook.notebook_id, artifact_type="study_guide", content=res))
-        db.commit()
-        return res
+        text = get_full_text(_notebook_with_documents(db, nb_id, profile))
+        res = ""
+        for res in _stream_text(generate_study_guide(text, stream=True)):
+            yield res
+        res = res.strip()
+        if res and not is_rate_limit_message(res):
+            upsert_artifact(db, nb_id, "study_guide", res)
+            commit_session(db)
     finally:
         db.close()
 
+def _last(gen):
+    """Runs a streaming handler to the end and returns what it yielded last."""
+    out = None
+    for out in gen:
+        pass
+    return out
+
+async def generate_all_ui(nb_id, mode, num_exchanges, num_q, profile: gr.OAuthProfile | None):
+    """Builds all four artifacts at once: each handler's Groq round trip runs in its own thread with its own session."""
+    summary, podcast, quiz, study = await asyncio.gather(
+        asyncio.to_thread(_last, generate_summary_ui(nb_id, mode, profile)),
+        asyncio.to_thread(generate_podcast_ui, nb_id, num_exchanges, profile),
+        asyncio.to_thread(gen_quiz_ui, nb_id, num_q, profile),
+        asyncio.to_thread(_last, get_study_guide_ui(nb_id, profile)),
+        return_exceptions=True,
+    )
+    # One failed generator must not blank the other three: its error goes to its own output
+    if isinstance(summary, Exception):
+        summary = f"❌ Summary error: {summary}"
+    if isinstance(podcast, Exception):
+        podcast = (f"❌ Podcast error: {podcast}", None)
+    if isinstance(quiz, Exception):
+        quiz = (f"❌ Quiz error: {quiz}", [], "", "", *[gr.update(visible=False) for _ in range(MAX_QUIZ_Q)])
+    if isinstance(study, Exception):
+        study = f"❌ Study guide error: {study}"
+    return (summary, *podcast, *quiz, study)
+
 def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
     empty_radios = [gr.update(visible=False, value=None) for _ in range(MAX_QUIZ_Q)]
     default_outputs = [
@@ -404,30 +800,35 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
         "",                       # pod_script_out
         None,                     # pod_lines_state
         "",                       # quiz_display_md
-        "{}",                     # quiz_json_box
+        [],                       # quiz_state
         "",                       # study_out
         None,                     # audio_out
-        ""                        # quiz_res_md
+        "",                       # quiz_res_md
+        "",                       # active_nb_id
     ] + empty_radios
 
     if not nb_name or not profile:
         return tuple(default_outputs)
 
-    db = get_db()
+    db = get_db_read()
     try:
-        notebook = db.query(Notebook).filter(Notebook.hf_user_id == profile.username, Notebook.title == nb_name).first()
+        # Documents and artifacts come back with the notebook (one IN query each, no lazy loads)
+        notebook = (
+            db.query(Notebook)
+            .options(selectinload(Notebook.documents), selectinload(Notebook.artifacts))
+            .filter(Notebook.hf_user_id == profile.username, Notebook.title == nb_name)
+            .first()
+        )
         if not notebook:
             default_outputs[0] = "❌ Notebook not found."
             return tuple(default_outputs)
             
         nb_id = notebook.notebook_id
+        docs = notebook.documents
         
-        chroma_dir = get_chroma_db_dir(profile.username, nb_id)
-        store = VectorStore(chroma_dir)
-        count = store.collection.count()
-        info_md = f"📊 **{nb_name}** · {count} context chunks indexed."
+        chunks = _chunk_total(profile.username, nb_id, sum(d.chunk_count or 0 for d in docs), len(docs))
+        info_md = _notebook_stats_md(nb_name, chunks, sum(d.word_count or 0 for d in docs))
 
-        docs = db.query(Document).filter(Document.notebook_id == nb_id).all()
         raw_dir = get_notebook_subdir(profile.username, nb_id, "files_raw")
         files = []
         import os
@@ -438,11 +839,9 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
         if not files:
             files = None
         
-        msgs = db.query(ChatMessage).filter(ChatMessage.notebook_id == nb_id).order_by(ChatMessage.created_at).all()
-        history = [{"role": m.role, "content": m.content} for m in msgs]
+        history = _chat_history(nb_id)
         
-        artifacts = db.query(Artifact).filter(Artifact.notebook_id == nb_id).all()
-        art_dict = {a.artifact_type: a.content for a in artifacts}
+        art_dict = {a.artifact_type: a.content for a in notebook.artifacts}
         
         sum_val = art_dict.get("summary_brief", art_dict.get("summary_descriptive", ""))
         
@@ -451,7 +850,7 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
         pod_lines_val = None
         if pod_key:
             try:
-                pod_data = json.loads(art_dict[pod_key])
+                pod_data = orjson.loads(art_dict[pod_key])
                 pod_script_val = pod_data.get("script", "")
                 pod_lines_val = pod_data.get("lines", [])
             except:
@@ -461,11 +860,10 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
         quiz_val = []
         if quiz_key:
             try:
-                quiz_val = json.loads(art_dict[quiz_key])
+                quiz_val = orjson.loads(art_dict[quiz_key])
             except:
                 pass
                 
-        quiz_json_val = json.dumps(quiz_val) if quiz_val else "{}"
         quiz_display = render_quiz_md(quiz_val) if quiz_val else ""
         
         quiz_radios = []
@@ -479,18 +877,9 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
         study_val = art_dict.get("study_guide", "")
         
         audio_out_val = None
-        audio_base64 = art_dict.get("podcast_audio")
-        if audio_base64:
-            import base64
-            import tempfile
-            try:
-                audio_bytes = base64.b64decode(audio_base64)
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-                tmp.write(audio_bytes)
-                tmp.close()
-                audio_out_val = tmp.name
-            except Exception as e:
-                print(f"Error loading audio: {e}")
+        audio_content = art_dict.get("podcast_audio")
+        if audio_content:
+            audio_out_val = _stored_audio_path(profile.username, nb_id, audio_content)
 
         return (
             info_md,
@@ -500,10 +889,11 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
             pod_script_val,
             pod_lines_val,
             quiz_display,
-            quiz_json_val,
+            quiz_val,
             study_val,
             audio_out_val,
             "",
+            nb_id,
             *quiz_radios
         )
     finally:
@@ -526,12 +916,15 @@ with gr.Blocks(title="ThinkBook 🧠", css=css) as demo:
     
     with gr.Row():
         active_nb = gr.Dropdown(choices=[], label="📚 Active Notebook", interactive=True, scale=4)
+        # Resolved once per notebook switch by load_notebook_data, so feature handlers skip the title lookup
+        active_nb_id = gr.State("")
         with gr.Column(scale=2):
             nb_info_md = gr.Markdown("_Login to start_")
             with gr.Row():
                 rename_in = gr.Textbox(placeholder="New name...", show_label=False, scale=3)
                 rename_btn = gr.Button("✏️ Rename", size="sm", scale=1)
                 delete_btn = gr.Button("🗑️ Delete", size="sm", scale=1, variant="stop")
+            gen_all_btn = gr.Button("⚡ Generate All", size="sm")
 
     demo.load(fetch_notebooks, outputs=active_nb)
 
@@ -548,7 +941,7 @@ with gr.Blocks(title="ThinkBook 🧠", css=css) as demo:
                     file_in1 = gr.File(label="Upload Files", file_count="multiple")
                     url_in1 = gr.Textbox(label="URL", visible=False)
                     def toggle(t): return gr.update(visible=t=="Files (PDF / PPTX / TXT)", value=None), gr.update(visible=t=="URL", value="")
-                    src_type1.change(toggle, inputs=src_type1, outputs=[file_in1, url_in1])
+                    src_type1.change(toggle, inputs=src_type1, outputs=[file_in1, url_in1], queue=False)
                     add_btn = gr.Button("🚀 Create Notebook", variant="primary")
                     add_status = gr.Markdown("_Add a notebook to begin_")
                     
@@ -560,7 +953,7 @@ with gr.Blocks(title="ThinkBook 🧠", css=css) as demo:
                     src_type2 = gr.Radio(["Files (PDF / PPTX / TXT)", "URL"], label="Source Type", value="Files (PDF / PPTX / TXT)")
                     file_in2 = gr.File(label="Upload Files", file_count="multiple")
                     url_in2 = gr.Textbox(label="URL", visible=False)
-                    src_type2.change(toggle, inputs=src_type2, outputs=[file_in2, url_in2])
+                    src_type2.change(toggle, inputs=src_type2, outputs=[file_in2, url_in2], queue=False)
 
                     append_btn = gr.Button("📎 Process & Append", variant="primary")
                     append_status = gr.Markdown()
@@ -575,8 +968,8 @@ with gr.Blocks(title="ThinkBook 🧠", css=css) as demo:
             with gr.Row():
                 chat_in = gr.Textbox(placeholder="Ask about your document...", scale=5, show_label=False)
                 send_btn = gr.Button("Send ➤", variant="primary")
-            send_btn.click(chat_response, [chat_in, chatbot, active_nb], [chatbot, chat_in])
-            chat_in.submit(chat_response, [chat_in, chatbot, active_nb], [chatbot, chat_in])
+            send_btn.click(chat_response, [chat_in, chatbot, active_nb_id], [chatbot, chat_in], concurrency_limit=CHAT_CONCURRENCY, concurrency_id="chat")
+            chat_in.submit(chat_response, [chat_in, chatbot, active_nb_id], [chatbot, chat_in], concurrency_limit=CHAT_CONCURRENCY, concurrency_id="chat")
 
         # Feature Tabs... 
         with gr.TabItem("📝 Summary"):
@@ -584,7 +977,7 @@ with gr.Blocks(title="ThinkBook 🧠", css=css) as demo:
             sum_btn = gr.Button("✨ Generate")
             sum_out = gr.Markdown()
             def load_sum(): return "⏳ Generating Summary..."
-            sum_btn.click(load_sum, None, sum_out).then(generate_summary_ui, [active_nb, sum_mode], sum_out)
+            sum_btn.click(load_sum, None, sum_out, queue=False).then(generate_summary_ui, [active_nb_id, sum_mode], sum_out)
 
         with gr.TabItem("🎙️ Podcast"):
             exchanges_sl = gr.Slider(8, 20, value=12, step=1, label="Exchanges")
@@ -592,65 +985,86 @@ with gr.Blocks(title="ThinkBook 🧠", css=css) as demo:
             pod_script_out = gr.Markdown()
             pod_lines_state = gr.State()
             def load_pod(): return "⏳ Generating Podcast Script...", None
-            pod_btn.click(load_pod, None, [pod_script_out, pod_lines_state]).then(generate_podcast_ui, [active_nb, exchanges_sl], [pod_script_out, pod_lines_state])
+            pod_btn.click(load_pod, None, [pod_script_out, pod_lines_state], queue=False).then(generate_podcast_ui, [active_nb_id, exchanges_sl], [pod_script_out, pod_lines_state])
             
             audio_btn = gr.Button("🔊 Generate Audio")
             audio_status = gr.Markdown()
             audio_out = gr.Audio(label="🎧 Listen")
-            def load_audio(): return None, "⏳ Generating Audio (may take a minute)..."
-            audio_btn.click(load_audio, None, [audio_out, audio_status]).then(generate_audio_ui, [pod_lines_state, active_nb], [audio_out, audio_status])
+            # TTS runs in _audio_pool; the click only starts it and this timer picks up the result
+            audio_timer = gr.Timer(AUDIO_POLL_SECS, active=False)
+            audio_btn.click(generate_audio_ui, [pod_lines_state, active_nb_id], [audio_out, audio_status, audio_timer])
+            audio_timer.tick(check_audio_ui, [pod_lines_state, active_nb_id], [audio_out, audio_status, audio_timer], queue=False)
 
         with gr.TabItem("🧪 Quiz"):
             num_q_sl = gr.Slider(3, MAX_QUIZ_Q, value=5, step=1, label="Questions")
             quiz_gen_btn = gr.Button("🎲 Generate Quiz")
-            quiz_json_box = gr.Textbox(visible=False, value="{}")
+            quiz_state = gr.State([])
             quiz_status_md = gr.Markdown()
             quiz_display_md = gr.Markdown()
             ans_radios = [gr.Radio(choices=["A", "B", "C", "D"], label=f"Q{i+1}", visible=False) for i in range(MAX_QUIZ_Q)]
             submit_btn = gr.Button("✅ Submit Answers")
             quiz_res_md = gr.Markdown()
             
-            def load_quiz(): return "⏳ Generating Quiz...", "{}", "", "", gr.update(visible=False)
+            def load_quiz(): return "⏳ Generating Quiz...", [], "", "", gr.update(visible=False)
             quiz_gen_btn.click(
-                load_quiz, None, [quiz_status_md, quiz_json_box, quiz_display_md, quiz_res_md] + [ans_radios[0]]
+                load_quiz, None, [quiz_status_md, quiz_state, quiz_display_md, quiz_res_md] + [ans_radios[0]], queue=False
             ).then(
-                gen_quiz_ui, [active_nb, num_q_sl], [quiz_status_md, quiz_json_box, quiz_display_md, quiz_res_md] + ans_radios
+                gen_quiz_ui, [active_nb_id, num_q_sl], [quiz_status_md, quiz_state, quiz_display_md, quiz_res_md] + ans_radios
             )
-            submit_btn.click(submit_quiz_ui, [quiz_json_box] + ans_radios, quiz_res_md)
+            submit_btn.click(submit_quiz_ui, [quiz_state] + ans_radios, quiz_res_md, queue=False)
 
         with gr.TabItem("📚 Study Guide"):
             study_btn = gr.Button("📚 Generate")
             study_out = gr.Markdown()
             def load_study(): return "⏳ Generating Study Guide..."
-            study_btn.click(load_study, None, study_out).then(get_study_guide_ui, [active_nb], study_out)
+            study_btn.click(load_study, None, study_out, queue=False).then(get_study_guide_ui, [active_nb_id], study_out)
 
     
     # === WIRING HOISTS ===
-    def _do_append(nb, st, fi, url, profile: gr.OAuthProfile | None): return process_source(nb, st, fi, url, True, profile)
-    def _do_add(nb, st, fi, url, profile: gr.OAuthProfile | None): return process_source(nb, st, fi, url, False, profile)
+    def _do_append(nb, st, fi, url, profile: gr.OAuthProfile | None, progress=gr.Progress()): return process_source(nb, st, fi, url, True, profile, progress)
+    def _do_add(nb, st, fi, url, profile: gr.OAuthProfile | None, progress=gr.Progress()): return process_source(nb, st, fi, url, False, profile, progress)
     
-    rename_btn.click(rename_notebook, [active_nb, rename_in], [active_nb, rename_in, nb_info_md])
-    delete_btn.click(delete_notebook, [active_nb], [active_nb, nb_info_md])
+    # Quick DB-only handlers skip the queue so they never wait behind LLM jobs
+    rename_btn.click(rename_notebook, [active_nb, active_nb_id, rename_in], [active_nb, rename_in, nb_info_md], queue=False)
+    delete_btn.click(delete_notebook, [active_nb], [active_nb, nb_info_md], queue=False)
     
+    # Summary, podcast script, quiz and study guide in one click, generated concurrently
+    def load_all(): return "⏳ Generating Summary...", "⏳ Generating Podcast Script...", "⏳ Generating Quiz...", "⏳ Generating Study Guide..."
+    gen_all_btn.click(load_all, None, [sum_out, pod_script_out, quiz_status_md, study_out], queue=False).then(
+        generate_all_ui, [active_nb_id, sum_mode, exchanges_sl, num_q_sl],
+        [sum_out, pod_script_out, pod_lines_state, quiz_status_md, quiz_state, quiz_display_md, quiz_res_md] + ans_radios + [study_out],
+    )
+
     # Refresh notebook data logic
     active_nb.change(
         load_notebook_data, 
         inputs=[active_nb], 
-        outputs=[nb_info_md, nb_files_view, chatbot, sum_out, pod_script_out, pod_lines_state, quiz_display_md, quiz_json_box, study_out, audio_out, quiz_res_md] + ans_radios
+        outputs=[nb_info_md, nb_files_view, chatbot, sum_out, pod_script_out, pod_lines_state, quiz_display_md, quiz_state, study_out, audio_out, quiz_res_md, active_nb_id] + ans_radios
     )
 
     # Note: add_btn action requires the `notebook_name` input
     add_btn.click(_do_add, [nb_name, src_type1, file_in1, url_in1], [add_status, active_nb]).then(
         clear_file, None, file_in1
     ).then(
-        load_notebook_data, inputs=[active_nb], outputs=[nb_info_md, nb_files_view, chatbot, sum_out, pod_script_out, pod_lines_state, quiz_display_md, quiz_json_box, study_out, audio_out, quiz_res_md] + ans_radios
+        load_notebook_data, inputs=[active_nb], outputs=[nb_info_md, nb_files_view, chatbot, sum_out, pod_script_out, pod_lines_state, quiz_display_md, quiz_state, study_out, audio_out, quiz_res_md, active_nb_id] + ans_radios
     )
     
     append_btn.click(_do_append, [active_nb, src_type2, file_in2, url_in2], [append_status, active_nb]).then(
         clear_file, None, file_in2
     ).then(
-        load_notebook_data, inputs=[active_nb], outputs=[nb_info_md, nb_files_view, chatbot, sum_out, pod_script_out, pod_lines_state, quiz_display_md, quiz_json_box, study_out, audio_out, quiz_res_md] + ans_radios
+        load_notebook_data, inputs=[active_nb], outputs=[nb_info_md, nb_files_view, chatbot, sum_out, pod_script_out, pod_lines_state, quiz_display_md, quiz_state, study_out, audio_out, quiz_res_md, active_nb_id] + ans_radios
     )
 
+def _on_sigterm(signum, frame):
+    # atexit handlers don't run when the process is killed by SIGTERM (e.g. a container stop),
+    # so buffered chat turns are flushed here and the exit goes through the normal shutdown path
+    chat_buffer.flush()
+    sys.exit(0)
+
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    threading.Thread(target=_warmup_embedder, daemon=True).start()
+    threading.Thread(target=_migrate_legacy_audio, daemon=True).start()
+    # Queueing is what lets generator handlers (streaming chat) push partial updates
+    demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
     demo.launch()
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Small thread-safe in-process LRU cache.
+Used to keep hot artifacts (and other per-notebook objects) in memory so
+repeat requests skip SQLite / disk entirely.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 128, getsizeof: Optional[Callable[[Any], int]] = None, ttl: Optional[float] = None):
+        """
+        maxsize: capacity, measured in units of getsizeof (entries by default)
+        getsizeof: size of one value, e.g. len for a byte budget on str/bytes
+        ttl: seconds before an entry expires (None = never)
+        """
+        self.maxsize = maxsize
+        self.getsizeof = getsizeof or (lambda value: 1)
+        self.ttl = ttl
+        self.currsize = 0
+        self._data = OrderedDict()  # key -> (value, size, timestamp)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        return self.get(key) is not None
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, _size, ts = item
+            if self.ttl is not None and time.time() - ts > self.ttl:
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        size = self.getsizeof(value)
+        with self._lock:
+            if size > self.maxsize:
+                # Too big to ever fit; caching it would just flush everything else.
+                # The old value under this key is stale now, so it goes too
+                if key in self._data:
+                    self._remove(key)
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, time.time())
+            self.currsize += size
+            while self.currsize > self.maxsize:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def invalidate_prefix(self, prefix: tuple):
+        """Drops every tuple key that starts with prefix, e.g. (hf_user_id, notebook_id)."""
+        n = len(prefix)
+        with self._lock:
+            for key in [k for k in self._data if isinstance(k, tuple) and k[:n] == prefix]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currsize = 0
+
+    def _remove(self, key: Hashable):
+        value, size, _ts = self._data.pop(key)
+        self.currsize -= size
+        return value
@@ -0,0 +1,120 @@
+"""
+Write-behind buffer for chat messages.
+A chat turn only appends its two rows in memory; a background thread inserts them
+with one executemany batch every CHAT_FLUSH_SECS (or as soon as CHAT_FLUSH_ROWS pile up),
+so no turn waits on a SQLite commit.
+"""
+import atexit
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from core.database import SessionLocal, ChatMessage, commit_session
+
+CHAT_FLUSH_SECS = float(os.environ.get("CHAT_FLUSH_SECS", "5"))
+CHAT_FLUSH_ROWS = int(os.environ.get("CHAT_FLUSH_ROWS", "32"))
+# A batch that keeps failing on a locked/busy database is given up after this many flushes
+CHAT_FLUSH_ATTEMPTS = int(os.environ.get("CHAT_FLUSH_ATTEMPTS", "3"))
+
+
+class ChatWriteBuffer:
+    def __init__(self, flush_secs: float = CHAT_FLUSH_SECS, flush_rows: int = CHAT_FLUSH_ROWS):
+        self.flush_secs = flush_secs
+        self.flush_rows = flush_rows
+        self._rows: List[dict] = []  # insert(ChatMessage) parameter dicts, oldest first
+        self._lock = threading.Lock()
+        # Held for a whole flush, so drop() never races a batch that is being written
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._failures = 0  # consecutive failed flushes of the rows at the head of the buffer
+
+    def add(self, notebook_id: str, role: str, content: str):
+        # Timestamped now, not at flush time, so history keeps its order
+        row = {
+            "message_id": str(uuid.uuid4()),
+            "notebook_id": notebook_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.flush_rows
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def pending(self, notebook_id: str) -> List[dict]:
+        """Buffered (not yet committed) messages of one notebook as {"role", "content"}, oldest first."""
+        with self._lock:
+            return [{"role": r["role"], "content": r["content"]} for r in self._rows if r["notebook_id"] == notebook_id]
+
+    def history(self, notebook_id: str, load_committed) -> List[dict]:
+        """
+        load_committed(notebook_id) + pending(notebook_id) as one snapshot: no flush can move rows from
+        the buffer into SQLite in between and drop or repeat those turns. load_committed should start a
+        fresh read, not reuse a transaction whose snapshot is older than this call.
+        """
+        with self._flush_lock:
+            return load_committed(notebook_id) + self.pending(notebook_id)
+
+    def drop(self, notebook_id: str):
+        """Forgets buffered messages of a notebook that is being deleted."""
+        with self._flush_lock, self._lock:
+            self._rows = [r for r in self._rows if r["notebook_id"] != notebook_id]
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._rows)
+            if not batch:
+                return
+            db = SessionLocal()
+            try:
+                db.execute(insert(ChatMessage), batch)
+                commit_session(db)
+            except OperationalError as e:
+                # Locked/busy database: rows stay buffered for the next flush, but not forever
+                db.rollback()
+                self._failures += 1
+                if self._failures < CHAT_FLUSH_ATTEMPTS:
+                    print(f"[ThinkBook] Chat history flush failed ({len(batch)} rows), retrying: {e}")
+                    return
+                print(f"[ThinkBook] Chat history flush failed {self._failures} times, dropping {len(batch)} rows: {e}")
+            except Exception as e:
+                # A bad row would fail every retry: insert one by one and drop only the rows that fail
+                db.rollback()
+                dropped = 0
+                for row in batch:
+                    try:
+                        db.execute(insert(ChatMessage), [row])
+                        commit_session(db)
+                    except Exception:
+                        db.rollback()
+                        dropped += 1
+                print(f"[ThinkBook] Chat history flush failed, dropped {dropped} of {len(batch)} rows: {e}")
+            finally:
+                db.close()
+            self._failures = 0
+            with self._lock:
+                # add() only appends and drop() waits for us, so the batch is still the head of the list
+                del self._rows[:len(batch)]
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_secs)
+            self._wake.clear()
+            self.flush()
+
+
+chat_buffer = ChatWriteBuffer()
+# Whatever is still buffered goes to SQLite on a normal shutdown
+atexit.register(chat_buffer.flush)
@@ -1,7 +1,47 @@
 """
 Splits long text into overlapping chunks for embedding and retrieval.
 """
-from typing import List
+import hashlib
+import re
+from typing import Iterator, List, Optional, Set
+
+# Characters of text split at a time: str.split() runs in C per block, and only one block's
+# words are alive at once (a list of every word is several times the size of the text)
+SPLIT_BLOCK = 1 << 20
+_SPACE_RE = re.compile(r"\s")
+
+
+def _iter_word_blocks(text: str) -> Iterator[List[str]]:
+    """text.split(), one block of words at a time; blocks end on whitespace so no word is cut."""
+    block = SPLIT_BLOCK
+    start, n = 0, len(text)
+    while start < n:
+        end = start + block
+        if end < n:
+            space = _SPACE_RE.search(text, end)
+            end = space.start() if space else n
+        yield text[start:end].split()
+        start = end
+
+
+def iter_chunks(text: str, chunk_size: int = 500, overlap: int = 50) -> Iterator[str]:
+    """
+    Yields the same chunks as chunk_text, lazily: words are split off the text a block
+    at a time, so only about one block of them is held instead of the whole word list.
+    """
+    step = chunk_size - overlap
+    words = []
+    for block in _iter_word_blocks(text):
+        words.extend(block)
+        pos = 0
+        while len(words) - pos >= chunk_size:
+            yield " ".join(words[pos:pos + chunk_size])
+            pos += step
+        # Keep the unfinished window (overlap included) for the next block
+        words = words[pos:]
+    # Tail: every remaining start position that still has words after it
+    for pos in range(0, len(words), step):
+        yield " ".join(words[pos:pos + chunk_size])
 
 
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
@@ -10,13 +50,39 @@ def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]
     chunk_size: number of words per chunk
     overlap: number of words to overlap between chunks
     """
-    words = text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        if chunk.strip():
-            chunks.append(chunk)
-        start += chunk_size - overlap
-    return chunks
+    return list(iter_chunks(text, chunk_size, overlap))
+
+
+def dedupe_chunks(chunks: List[str], seen: Optional[Set[bytes]] = None) -> List[str]:
+    """
+    Drops chunks that repeat an earlier one, ignoring case (repeated boilerplate pages, the same
+    file uploaded twice), so they are neither embedded nor stored. Pass the same seen set
+    across the sources of one upload to dedupe between them too.
+    """
+    seen = set() if seen is None else seen
+    unique = []
+    for chunk in chunks:
+        # Chunks are already single-space joined, so only case needs normalizing
+        h = hashlib.blake2b(chunk.lower().encode("utf-8"), digest_size=16).digest()
+        if h not in seen:
+            seen.add(h)
+            unique.append(chunk)
+    return unique
+
+
+def truncate_words(text: str, max_words: int) -> str:
+    """
+    The first max_words words joined by single spaces, or text itself (same object) if it has no more
+    than that; a long text is only split up to the block that crosses the limit.
+    """
+    words = []
+    for block in _iter_word_blocks(text):
+        words.extend(block)
+        if len(words) > max_words:
+            return " ".join(words[:max_words])
+    return text
+
+
+def count_words(text: str) -> int:
+    """len(text.split()) without building the list of every word."""
+    return sum(len(block) for block in _iter_word_blocks(text))
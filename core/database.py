@@ -1,6 +1,9 @@
 import os
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, ForeignKey, Text
+import threading
+import uuid
+from sqlalchemy import create_engine, event, Column, String, Integer, DateTime, ForeignKey, Text, Index, text, inspect, select, bindparam, delete
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime, timezone
 
 # Ensure the parent directory exists before creating the database
@@ -11,7 +14,55 @@ if DB_PATH.startswith("sqlite:///"):
     os.makedirs(os.path.dirname(local_path), exist_ok=True)
 
 engine = create_engine(DB_PATH, connect_args={"check_same_thread": False})
+
+# Separate pool of query-only connections for read handlers; WAL lets them run alongside the writer.
+# An in-memory database can't be shared between engines, so it keeps the single one.
+_SEPARATE_READ_ENGINE = DB_PATH.startswith("sqlite") and ":memory:" not in DB_PATH
+read_engine = (
+    create_engine(
+        DB_PATH,
+        connect_args={"check_same_thread": False},
+        pool_size=int(os.environ.get("DB_READ_POOL_SIZE", "8")),
+        max_overflow=4,
+    )
+    if _SEPARATE_READ_ENGINE else engine
+)
+
+# Per-connection SQLite page cache and memory-mapped I/O window
+SQLITE_CACHE_MB = int(os.environ.get("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.environ.get("SQLITE_MMAP_MB", "256"))
+
+if DB_PATH.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        # WAL + NORMAL sync: readers don't block the writer and each commit skips a full fsync
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        # A concurrent writer (e.g. a background thread) waits for the lock instead of failing with "database is locked"
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")  # negative = KiB
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cursor.close()
+
+if _SEPARATE_READ_ENGINE:
+    @event.listens_for(read_engine, "connect")
+    def _set_read_pragmas(dbapi_conn, record):
+        _set_sqlite_pragmas(dbapi_conn, record)
+        # Anything that tries to write through the read pool fails loudly instead of taking the write lock
+        dbapi_conn.execute("PRAGMA query_only=ON")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# SQLite has one writer: commits from this process queue here instead of spinning on busy_timeout
+WRITE_LOCK = threading.Lock()
+
+def commit_session(db):
+    """db.commit() serialized behind WRITE_LOCK (the flush happens inside, since autoflush is off)."""
+    with WRITE_LOCK:
+        db.commit()
 Base = declarative_base()
 
 class Notebook(Base):
@@ -22,8 +73,15 @@ class Notebook(Base):
     title = Column(String, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
-    documents = relationship("Document", back_populates="notebook", cascade="all, delete-orphan")
-    messages = relationship("ChatMessage", back_populates="notebook", cascade="all, delete-orphan")
+    __table_args__ = (
+        Index("ix_notebook_user_created", "hf_user_id", "created_at"),  # list_notebooks ORDER BY
+        # Every (user, title) lookup from the UI is one index seek. Not unique: older databases may hold duplicate titles
+        Index("ix_notebook_user_title", "hf_user_id", "title"),
+    )
+
+    # Load these with selectinload() when needed so the parent + children cost two queries, not N+1
+    documents = relationship("Document", back_populates="notebook", cascade="all, delete-orphan", order_by="Document.created_at")
+    messages = relationship("ChatMessage", back_populates="notebook", cascade="all, delete-orphan", order_by="ChatMessage.created_at")
     artifacts = relationship("Artifact", back_populates="notebook", cascade="all, delete-orphan")
 
 class Document(Base):
@@ -34,8 +92,15 @@ class Document(Base):
     filename = Column(String, nullable=False)
     file_type = Column(String, nullable=False)
     chunk_count = Column(Integer, default=0)
+    word_count = Column(Integer, nullable=True) # counted once at ingest so the UI never re-splits the text
+    content_sha256 = Column(String, nullable=True) # hex digest of the raw upload, None for URLs
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        # Same file uploaded twice to a notebook is detected with one index seek
+        Index("ix_document_nb_sha256", "notebook_id", "content_sha256", unique=True),
+    )
+
     notebook = relationship("Notebook", back_populates="documents")
 
 class ChatMessage(Base):
@@ -47,6 +112,10 @@ class ChatMessage(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index("ix_chatmsg_nb_created", "notebook_id", "created_at"),  # history in chronological order
+    )
+
     notebook = relationship("Notebook", back_populates="messages")
 
 class Artifact(Base):
@@ -58,12 +127,52 @@ class Artifact(Base):
     content = Column(Text, nullable=False) # JSON or markdown string
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        # One cached artifact per (notebook, type); makes the cache check an index seek
+        Index("ix_artifact_nb_type", "notebook_id", "artifact_type", unique=True),
+    )
+
     notebook = relationship("Notebook", back_populates="artifacts")
 
 # Create all tables in the engine. This is equivalent to "Create Table"
 # statements in raw SQL.
 Base.metadata.create_all(bind=engine)
 
+def _migrate():
+    """
+    Brings databases created by older versions up to date.
+    create_all() only builds missing tables, so new columns and indexes on existing tables are added here.
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+
+        missing = [
+            index for table in Base.metadata.sorted_tables
+            for index in table.indexes
+            if index.name not in {i["name"] for i in inspector.get_indexes(table.name)}
+        ]
+        if not missing:
+            # Up to date: no table scans or write lock on a normal boot
+            return
+        if any(index.name == "ix_artifact_nb_type" for index in missing):
+            # Concurrent generations could store the same artifact twice; keep the newest before adding the unique index
+            conn.execute(text(
+                "DELETE FROM artifacts WHERE rowid NOT IN "
+                "(SELECT MAX(rowid) FROM artifacts GROUP BY notebook_id, artifact_type)"
+            ))
+        for index in missing:
+            index.create(conn, checkfirst=True)
+        # Refresh planner statistics so SQLite picks the new indexes
+        conn.execute(text("ANALYZE"))
+
+_migrate()
+
 def get_db():
     """Dependency for getting DB session"""
     db = SessionLocal()
@@ -71,3 +180,79 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Built once so every ownership check reuses the same compiled statement from SQLAlchemy's cache
+OWNER_STMT = select(Notebook).where(Notebook.notebook_id == bindparam("nb"), Notebook.hf_user_id == bindparam("u"))
+
+def get_owned_notebook(db, notebook_id: str, hf_user_id: str, *options):
+    """
+    Returns the notebook if it belongs to hf_user_id, else None.
+    options: loader options such as selectinload(Notebook.messages)
+    """
+    stmt = OWNER_STMT.options(*options) if options else OWNER_STMT
+    return db.execute(stmt, {"nb": notebook_id, "u": hf_user_id}).scalar_one_or_none()
+
+# Content only: skips building an ORM object around a potentially large TEXT column
+ARTIFACT_CONTENT_STMT = select(Artifact.content).where(Artifact.notebook_id == bindparam("nb"), Artifact.artifact_type == bindparam("t"))
+
+def get_artifact_content(db, notebook_id: str, artifact_type: str):
+    """Returns the cached artifact content, or None if it was never generated."""
+    return db.execute(ARTIFACT_CONTENT_STMT, {"nb": notebook_id, "t": artifact_type}).scalar_one_or_none()
+
+# Just the two columns history needs, in order off ix_chatmsg_nb_created; rows come back as tuples, not ORM objects
+CHAT_HISTORY_STMT = (
+    select(ChatMessage.role, ChatMessage.content)
+    .where(ChatMessage.notebook_id == bindparam("nb"))
+    .order_by(ChatMessage.created_at)
+)
+
+def get_chat_history(db, notebook_id: str) -> list:
+    """Returns the notebook's messages as [{"role", "content"}, ...], oldest first."""
+    return [{"role": role, "content": content} for role, content in db.execute(CHAT_HISTORY_STMT, {"nb": notebook_id})]
+
+def upsert_artifact(db, notebook_id: str, artifact_type: str, content: str):
+    """
+    Inserts or replaces the cached artifact in a single INSERT ... ON CONFLICT statement,
+    relying on the unique (notebook_id, artifact_type) index. The caller commits.
+    """
+    stmt = sqlite_insert(Artifact).values(
+        artifact_id=str(uuid.uuid4()),
+        notebook_id=notebook_id,
+        artifact_type=artifact_type,
+        content=content,
+        created_at=datetime.now(timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["notebook_id", "artifact_type"],
+        set_={"content": stmt.excluded.content, "created_at": stmt.excluded.created_at},
+    )
+    db.execute(stmt)
+
+def backfill_chunk_count(db, notebook_id: str, count_chunks) -> int:
+    """
+    Returns the notebook's chunk total from the stored per-document counts. Notebooks ingested before
+    chunk_count was stored read 0 on every document: then count_chunks() is called once and the total
+    is kept on the oldest document, so the SUM is right from then on. The caller commits.
+    """
+    docs = db.query(Document).filter(Document.notebook_id == notebook_id).order_by(Document.created_at).all()
+    known = sum(d.chunk_count or 0 for d in docs)
+    if known or not docs:
+        return known
+    total = count_chunks()
+    if total:
+        docs[0].chunk_count = total
+    return total
+
+def delete_notebooks(db, *criteria) -> list:
+    """
+    Deletes the notebooks matching criteria together with their documents, messages and artifacts,
+    and returns the deleted notebook ids. Plain DELETE ... RETURNING statements: unlike db.delete()
+    with the ORM cascade, no child rows are loaded first. The caller commits.
+    """
+    bulk = {"synchronize_session": False}
+    ids = db.execute(delete(Notebook).where(*criteria).returning(Notebook.notebook_id), execution_options=bulk).scalars().all()
+    if ids:
+        for model in (Document, ChatMessage, Artifact):
+            db.execute(delete(model).where(model.notebook_id.in_(ids)), execution_options=bulk)
+    return ids
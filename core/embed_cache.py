@@ -0,0 +1,110 @@
+"""
+Persistent embedding cache: sha256(model + chunk text) -> float32 vector bytes.
+Re-ingesting a file that was seen before (same model) skips the model entirely.
+Bounded to EMBED_CACHE_MAX_ROWS; the least recently used vectors are pruned first.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List
+
+import numpy as np
+
+EMBED_CACHE_PATH = os.environ.get(
+    "EMBED_CACHE_PATH", os.path.join(os.environ.get("DATA_ROOT", "./data"), "embed_cache.sqlite")
+)
+
+# Vectors kept at most (~1.5 KB each at 384 dims); 0 = unbounded
+EMBED_CACHE_MAX_ROWS = int(os.environ.get("EMBED_CACHE_MAX_ROWS", "200000"))
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+_LOOKUP_SLICE = 500
+
+
+class EmbedCache:
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_rows: int = EMBED_CACHE_MAX_ROWS):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_rows = max_rows
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS emb (hash BLOB PRIMARY KEY, vec BLOB NOT NULL, used REAL NOT NULL DEFAULT 0)")
+        # Caches created before the row cap have no last-used column; their rows count as oldest
+        if "used" not in {row[1] for row in self._conn.execute("PRAGMA table_info(emb)")}:
+            self._conn.execute("ALTER TABLE emb ADD COLUMN used REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_emb_used ON emb (used)")
+        self._conn.commit()
+        # Counted once here, then tracked on insert/prune, so puts never run COUNT(*)
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM emb").fetchone()[0]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        return hashlib.sha256((model_name + "\0" + text).encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> dict:
+        """Returns {key: vector} for the keys that are cached."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _LOOKUP_SLICE):
+                part = keys[i:i + _LOOKUP_SLICE]
+                marks = ",".join("?" * len(part))
+                for h, blob in self._conn.execute(f"SELECT hash, vec FROM emb WHERE hash IN ({marks})", part):
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                # Hits are marked used, so pruning goes by last use rather than insert order
+                hits = list(found)
+                for i in range(0, len(hits), _LOOKUP_SLICE):
+                    part = hits[i:i + _LOOKUP_SLICE]
+                    self._conn.execute(f"UPDATE emb SET used = ? WHERE hash IN ({','.join('?' * len(part))})", [now, *part])
+                self._conn.commit()
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        now = time.time()
+        rows = [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in zip(keys, vectors)]
+        with self._lock:
+            self._rows += self._conn.executemany("INSERT OR IGNORE INTO emb (hash, vec, used) VALUES (?, ?, ?)", rows).rowcount
+            if self.max_rows and self._rows > self.max_rows:
+                self._rows -= self._conn.execute(
+                    "DELETE FROM emb WHERE hash IN (SELECT hash FROM emb ORDER BY used LIMIT ?)", (self._rows - self.max_rows,)
+                ).rowcount
+            self._conn.commit()
+
+    def embed(self, texts: List[str], model_name: str, embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns embeddings for texts in order, calling embed_fn only for the misses
+        (duplicates within texts are embedded once).
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [self.key(model_name, t) for t in texts]
+        found = self.get_many(list(set(keys)))
+
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            miss_keys = list(missing)
+            vectors = np.asarray(embed_fn([missing[k] for k in miss_keys]), dtype=np.float32)
+            self.put_many(miss_keys, vectors)
+            found.update(zip(miss_keys, vectors))
+
+        return np.stack([found[k] for k in keys])
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embed_cache() -> EmbedCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbedCache()
+    return _cache
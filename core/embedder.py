@@ -1,25 +1,71 @@
 """
 Generates embeddings using sentence-transformers (runs locally, no API cost).
 """
+import functools
+import os
+import threading
+import torch
 from sentence_transformers import SentenceTransformer
 import numpy as np
+from core.embed_cache import get_embed_cache
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+# Namespace for the persistent cache: change it whenever the model or normalization changes
+CACHE_NAMESPACE = f"{MODEL_NAME}:normalized"
+# Set EMBED_CACHE=0 to always run the model
+EMBED_CACHE = os.environ.get("EMBED_CACHE", "1") == "1"
+
+# Chunks per forward pass; larger batches keep the matmuls big until memory runs out
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "128"))
+
+# "cuda" / "cpu" / ...; defaults to the GPU when one is visible
+EMBED_DEVICE = os.environ.get("EMBED_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
 
 _model = None
+_model_lock = threading.Lock()
 
 
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        # Requests run in a threadpool, so make sure only one of them loads the weights
+        with _model_lock:
+            if _model is None:
+                _model = SentenceTransformer(MODEL_NAME, device=EMBED_DEVICE)
     return _model
 
 
-def embed_texts(texts: list) -> np.ndarray:
+def warmup():
+    """Loads the model and runs one tiny encode so the first real request doesn't pay for it."""
+    get_model().encode(["warmup"], convert_to_numpy=True)
+
+
+def _encode(texts: list, batch_size: int) -> np.ndarray:
     model = get_model()
-    embeddings = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
+    embeddings = model.encode(
+        texts,
+        batch_size=batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
     return embeddings
 
 
+def embed_texts(texts: list, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """Embeds chunks, reusing vectors from the on-disk cache for text seen before."""
+    if EMBED_CACHE:
+        return get_embed_cache().embed(texts, CACHE_NAMESPACE, lambda misses: _encode(misses, batch_size))
+    return _encode(texts, batch_size)
+
+
+@functools.lru_cache(maxsize=1024)
+def _embed_query_cached(query: str) -> np.ndarray:
+    vec = get_model().encode([query], convert_to_numpy=True, normalize_embeddings=True)[0]
+    vec.setflags(write=False)  # shared between callers
+    return vec
+
+
 def embed_query(query: str) -> np.ndarray:
-    model = get_model()
-    return model.encode([query], convert_to_numpy=True)[0]
+    # Repeated questions in a session skip the model
+    return _embed_query_cached(query)
@@ -0,0 +1,95 @@
+"""
+Exact in-memory nearest-neighbour search for small collections.
+For a few thousand normalized vectors one dense matmul (q @ X.T) beats walking
+an HNSW graph, and the result is exact instead of approximate.
+"""
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from core.quantization import quantize_int8
+
+# Rows scored per matmul when quantized, bounds the temporary float32 copy of the codes
+_SCORE_BLOCK = 4096
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ExactIndex:
+    def __init__(self, dim: Optional[int] = None, quantize: bool = False):
+        """
+        quantize: keep vectors as int8 codes + per-row scales (4x less memory);
+        queries stay float32, so scores are scale * (codes @ q)
+        """
+        self.dim = dim
+        self.quantize = quantize
+        self._matrix = np.empty((0, dim or 0), dtype=np.int8 if quantize else np.float32)
+        self._scales = np.empty(0, dtype=np.float32)
+        self.documents: List[str] = []
+        self.metadatas: List[dict] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the stored vectors."""
+        return self._matrix.nbytes + self._scales.nbytes
+
+    def add(self, embeddings, documents: List[str], metadatas: Optional[List[dict]] = None):
+        """embeddings: (n, dim) array-like; rows are re-normalized so inner product == cosine."""
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        if vecs.ndim != 2 or len(vecs) != len(documents):
+            raise ValueError("embeddings must be (n, dim) and match documents")
+        if not len(documents):
+            return
+        vecs = _normalize(vecs)
+        scales = None
+        if self.quantize:
+            vecs, scales = quantize_int8(vecs)
+        with self._lock:
+            if not len(self):
+                self.dim = vecs.shape[1]
+                self._matrix = np.ascontiguousarray(vecs)
+                if scales is not None:
+                    self._scales = scales
+            else:
+                self._matrix = np.ascontiguousarray(np.vstack([self._matrix, vecs]))
+                if scales is not None:
+                    self._scales = np.concatenate([self._scales, scales])
+            self.documents.extend(documents)
+            self.metadatas.extend(metadatas or [{} for _ in documents])
+
+    def search(self, query_embedding, top_k: int = 5) -> List[int]:
+        """Returns positions of the top_k most similar rows, best first."""
+        return self.search_many(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1), top_k)[0]
+
+    def search_many(self, query_embeddings, top_k: int = 5) -> List[List[int]]:
+        """search() for each row of a (b, dim) query matrix, scored in one matmul."""
+        qs = np.asarray(query_embeddings, dtype=np.float32)
+        with self._lock:
+            n = len(self)
+            if n == 0 or top_k <= 0:
+                return [[] for _ in qs]
+            qs = _normalize(qs)
+            if self.quantize:
+                scores = np.empty((n, len(qs)), dtype=np.float32)
+                for start in range(0, n, _SCORE_BLOCK):
+                    block = self._matrix[start:start + _SCORE_BLOCK]
+                    scores[start:start + len(block)] = block.astype(np.float32) @ qs.T
+                scores *= self._scales[:, None]
+            else:
+                scores = self._matrix @ qs.T
+        k = min(top_k, n)
+        hits = []
+        for col in scores.T:
+            # argpartition finds the top k in O(n); only those k get sorted
+            idx = np.argpartition(-col, k - 1)[:k]
+            hits.append(idx[np.argsort(-col[idx])].tolist())
+        return hits
@@ -5,7 +5,7 @@ If the primary model hits a rate limit, it automatically tries the next one.
 """
 import os
 import re
-from groq import Groq
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,13 +17,21 @@ MODELS = [
     "mixtral-8x7b-32768",
 ]
 
-def get_groq_client():
+def _get_api_key() -> str:
     api_key = os.environ.get("GROQ_API_KEY")
     if not api_key:
         raise ValueError(
             "GROQ_API_KEY not set. Please add it to your .env file or HuggingFace Space Secrets."
         )
-    return Groq(api_key=api_key)
+    return api_key
+
+
+def get_groq_client():
+    return Groq(api_key=_get_api_key())
+
+
+def get_async_groq_client():
+    return AsyncGroq(api_key=_get_api_key())
 
 
 def _is_rate_limit_error(e) -> bool:
@@ -35,6 +43,11 @@ def _is_not_found_error(e) -> bool:
     return "404" in msg or "does not exist" in msg or "model_decommissioned" in msg
 
 
+_RETRY_TIME_RE = re.compile(
+    r'try again in\s+((?:(\d+)h)?(?:(\d+)m)?(?:([\d.]+)s)?)', re.IGNORECASE
+)
+
+
 def _extract_retry_time(e) -> str:
     """
     Pull the human-readable retry time from the Groq error message.
@@ -42,10 +55,7 @@ def _extract_retry_time(e) -> str:
     """
     raw = str(e)
     # Match patterns like 1h56m35.808s / 45m12s / 30s
-    match = re.search(
-        r'try again in\s+((?:(\d+)h)?(?:(\d+)m)?(?:([\d.]+)s)?)',
-        raw, re.IGNORECASE
-    )
+    match = _RETRY_TIME_RE.search(raw)
     if match:
         hours   = match.group(2)
         minutes = match.group(3)
@@ -61,6 +71,14 @@ def _extract_retry_time(e) -> str:
     return "a few minutes"
 
 
+RATE_LIMIT_NOTICE = "⏳ **All AI models are currently at their rate limit.**"
+
+
+def is_rate_limit_message(text: str) -> bool:
+    """True if the text is the friendly fallback returned when every model is exhausted."""
+    return text.startswith(RATE_LIMIT_NOTICE)
+
+
 def _friendly_rate_limit_message(errors: list) -> str:
     """Build a friendly message from all the rate limit errors collected."""
     # Try to find any retry time hint from the errors
@@ -72,7 +90,7 @@ def _friendly_rate_limit_message(errors: list) -> str:
             break
 
     return (
-        f"⏳ **All AI models are currently at their rate limit.**\n\n"
+        f"{RATE_LIMIT_NOTICE}\n\n"
         f"Please try again in **{retry_time}**.\n\n"
         f"> 💡 Tip: Groq's free tier resets daily. "
         f"You can also upgrade at [console.groq.com/settings/billing](https://console.groq.com/settings/billing) for more tokens."
@@ -153,4 +171,45 @@ def groq_stream(
                 raise e
 
     # All models exhausted — yield friendly message
-    yield _friendly_rate_limit_message(errors)
\ No newline at end of file
+    yield _friendly_rate_limit_message(errors)
+
+
+async def groq_astream(
+    messages: list,
+    model: str = None,
+    temperature: float = 0.7,
+    max_tokens: int = 2048,
+):
+    """
+    Async version of groq_stream() for the FastAPI event loop: the HTTP stream is awaited,
+    so one worker can serve many chats at once. Same model fallback and friendly final message.
+    """
+    client = get_async_groq_client()
+    models_to_try = MODELS if model is None else ([model] + [m for m in MODELS if m != model])
+
+    errors = []
+    for attempt_model in models_to_try:
+        try:
+            stream = await client.chat.completions.create(
+                model=attempt_model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+            return  # success
+
+        except Exception as e:
+            if _is_rate_limit_error(e) or _is_not_found_error(e):
+                print(f"[ThinkBook] Skipping {attempt_model} (Rate limit or Not Found), trying next model...")
+                errors.append(e)
+                continue
+            else:
+                raise e
+
+    # All models exhausted — yield friendly message
+    yield _friendly_rate_limit_message(errors)
@@ -1,5 +1,6 @@
 """
 Handles loading text from PDF, PPTX, TXT files and URLs.
+File loaders accept either raw bytes or a path on disk (parsed without reading it all into memory).
 Returns raw text string.
 """
 import io
@@ -9,8 +10,11 @@ import requests
 from bs4 import BeautifulSoup
 
 
-def load_pdf(file_bytes: bytes) -> str:
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
+def load_pdf(source) -> str:
+    if isinstance(source, (bytes, bytearray)):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source, filetype="pdf")
     text = ""
     for page in doc:
         text += page.get_text()
@@ -18,8 +22,8 @@ def load_pdf(file_bytes: bytes) -> str:
     return text.strip()
 
 
-def load_pptx(file_bytes: bytes) -> str:
-    prs = Presentation(io.BytesIO(file_bytes))
+def load_pptx(source) -> str:
+    prs = Presentation(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
     text = ""
     for slide_num, slide in enumerate(prs.slides, 1):
         text += f"\n--- Slide {slide_num} ---\n"
@@ -29,7 +33,12 @@ def load_pptx(file_bytes: bytes) -> str:
     return text.strip()
 
 
-def load_txt(file_bytes: bytes) -> str:
+def load_txt(source) -> str:
+    if isinstance(source, (bytes, bytearray)):
+        file_bytes = source
+    else:
+        with open(source, "rb") as f:
+            file_bytes = f.read()
     try:
         return file_bytes.decode("utf-8").strip()
     except UnicodeDecodeError:
@@ -59,7 +68,7 @@ def load_url(url: str) -> str:
 def ingest_source(source_type: str, data) -> str:
     """
     source_type: 'pdf', 'pptx', 'txt', 'url'
-    data: bytes for files, str for url
+    data: bytes or a file path for files, str for url
     """
     if source_type == "pdf":
         return load_pdf(data)
@@ -0,0 +1,23 @@
+"""
+Symmetric per-vector int8 scalar quantization for embeddings.
+Each row v is stored as round(v / scale) with scale = max(|v|) / 127,
+so a 384-dim MiniLM vector drops from 1.5 KB to 388 bytes.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def quantize_int8(matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (codes int8 (n, d), scales float32 (n,))."""
+    m = np.asarray(matrix, dtype=np.float32)
+    if m.ndim == 1:
+        m = m[None, :]
+    scales = np.abs(m).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(m / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
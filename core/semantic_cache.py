@@ -0,0 +1,82 @@
+"""
+Per-notebook semantic cache for chat answers.
+Near-duplicate questions (cosine similarity >= threshold) reuse the previous
+retrieval context and LLM response instead of hitting ChromaDB and Groq again.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CacheEntry:
+    embedding: np.ndarray
+    context: list
+    response: str
+    timestamp: float
+
+
+class SemanticCache:
+    def __init__(self, max_entries: int = 128, threshold: float = 0.95, ttl: float = 3600.0):
+        """
+        max_entries: LRU capacity per namespace (one namespace per notebook)
+        threshold: minimum cosine similarity for a hit
+        ttl: seconds before an entry is considered stale
+        """
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, namespace: Hashable, embedding: np.ndarray) -> Optional[CacheEntry]:
+        """Returns the most similar fresh entry if it clears the threshold, else None."""
+        q = np.asarray(embedding, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0:
+            return None
+
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if not entries:
+                return None
+
+            # Drop expired entries before scoring (oldest first thanks to LRU order)
+            now = time.time()
+            for key in [k for k, e in entries.items() if now - e.timestamp > self.ttl]:
+                del entries[key]
+            if not entries:
+                return None
+
+            keys: List[str] = list(entries.keys())
+            matrix = np.stack([entries[k].embedding for k in keys])
+            # One vectorized pass: cosine similarity of the query against every cached query
+            sims = (matrix @ q) / (np.linalg.norm(matrix, axis=1) * q_norm)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+
+            entries.move_to_end(keys[best])
+            return entries[keys[best]]
+
+    def store(self, namespace: Hashable, embedding: np.ndarray, context: list, response: str):
+        with self._lock:
+            entries = self._namespaces.setdefault(namespace, OrderedDict())
+            entries[str(uuid.uuid4())] = CacheEntry(
+                embedding=np.asarray(embedding, dtype=np.float32),
+                context=context,
+                response=response,
+                timestamp=time.time(),
+            )
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, namespace: Hashable):
+        """Forget everything cached for a notebook (e.g. after new sources are ingested)."""
+        with self._lock:
+            self._namespaces.pop(namespace, None)
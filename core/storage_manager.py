@@ -1,11 +1,20 @@
+import io
 import os
 import shutil
+import tempfile
 import uuid
+from typing import Iterable, Optional
+
+from core.cache import LRUCache
 
 # Base path for all persistent data
 DATA_ROOT = os.environ.get("DATA_ROOT", "./data")
 USERS_DIR = os.path.join(DATA_ROOT, "users")
 
+# Assembled notebook text, keyed by (user, notebook, source ids): a notebook with new sources gets a new key,
+# so entries never go stale. Sized in characters.
+_text_cache = LRUCache(maxsize=int(os.environ.get("NOTEBOOK_TEXT_CACHE_MB", "64")) * 1024 * 1024, getsizeof=len)
+
 def _get_user_dir(hf_user_id: str) -> str:
     """Returns the base directory for a specific user: /data/users/<username>"""
     return os.path.join(USERS_DIR, hf_user_id)
@@ -31,6 +40,28 @@ def save_raw_file(hf_user_id: str, notebook_id: str, filename: str, file_bytes:
         f.write(file_bytes)
     return filepath
 
+def copy_raw_file(hf_user_id: str, notebook_id: str, filename: str, src_path: str) -> str:
+    """Copies a file already on disk into files_raw without loading it into memory."""
+    dir_path = get_notebook_subdir(hf_user_id, notebook_id, "files_raw")
+    filepath = os.path.join(dir_path, filename)
+    shutil.copyfile(src_path, filepath)
+    return filepath
+
+def create_raw_upload(hf_user_id: str, notebook_id: str):
+    """
+    Opens a hidden temp file inside files_raw so an upload can be streamed to disk.
+    Move it into place with commit_raw_upload() once ingestion succeeds.
+    """
+    dir_path = get_notebook_subdir(hf_user_id, notebook_id, "files_raw")
+    return tempfile.NamedTemporaryFile(dir=dir_path, prefix=".upload-", suffix=".part", delete=False)
+
+def commit_raw_upload(hf_user_id: str, notebook_id: str, filename: str, tmp_path: str) -> str:
+    """Renames a streamed upload to its original filename (same directory, so no copy)."""
+    dir_path = get_notebook_subdir(hf_user_id, notebook_id, "files_raw")
+    filepath = os.path.join(dir_path, filename)
+    os.replace(tmp_path, filepath)
+    return filepath
+
 def save_extracted_text(hf_user_id: str, notebook_id: str, filename: str, text: str) -> str:
     """Saves extracted text into the files_extracted directory."""
     dir_path = get_notebook_subdir(hf_user_id, notebook_id, "files_extracted")
@@ -39,8 +70,60 @@ def save_extracted_text(hf_user_id: str, notebook_id: str, filename: str, text:
         f.write(text)
     return filepath
 
+def load_extracted_text(hf_user_id: str, notebook_id: str, filename: str) -> Optional[str]:
+    """Reads text saved by save_extracted_text(), or None if it was never stored."""
+    filepath = os.path.join(get_notebook_dir(hf_user_id, notebook_id), "files_extracted", f"{filename}.txt")
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, "r", encoding="utf-8") as f:
+        return f.read()
+
+def load_notebook_text(hf_user_id: str, notebook_id: str, filenames: Iterable[str], sep: str = "\n\n") -> Optional[str]:
+    """
+    Concatenates the extracted text of several sources into one string.
+    Returns None if any source has no stored text (e.g. ingested by an older version).
+    Repeat calls for the same sources are served from memory.
+    """
+    key = (hf_user_id, notebook_id, tuple(filenames), sep)
+    cached = _text_cache.get(key)
+    if cached is not None:
+        return cached
+    buf = io.StringIO()
+    for i, filename in enumerate(key[2]):
+        text = load_extracted_text(hf_user_id, notebook_id, filename)
+        if text is None:
+            return None
+        if i:
+            buf.write(sep)
+        buf.write(text)
+    full_text = buf.getvalue()
+    _text_cache.set(key, full_text)
+    return full_text
+
+def save_artifact_file(hf_user_id: str, notebook_id: str, filename: str, data: bytes) -> str:
+    """
+    Writes a binary artifact (e.g. podcast.mp3) into the notebook's artifacts directory.
+    Returns the path relative to the notebook dir, which is what gets stored in the DB.
+    """
+    dir_path = get_notebook_subdir(hf_user_id, notebook_id, "artifacts")
+    filepath = os.path.join(dir_path, filename)
+    # Write next to the target then rename, so readers never see a half-written file
+    with tempfile.NamedTemporaryFile(dir=dir_path, prefix=".tmp-", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, filepath)
+    return os.path.join("artifacts", filename)
+
+def resolve_notebook_path(hf_user_id: str, notebook_id: str, rel_path: str) -> Optional[str]:
+    """Turns a path stored by save_artifact_file() back into an absolute path, or None if missing/outside the notebook."""
+    base = os.path.abspath(get_notebook_dir(hf_user_id, notebook_id))
+    path = os.path.abspath(os.path.join(base, rel_path))
+    if not path.startswith(base + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
 def delete_notebook_storage(hf_user_id: str, notebook_id: str) -> bool:
     """Recursively deletes a notebook's entire directory structure."""
+    _text_cache.invalidate_prefix((hf_user_id, notebook_id))
     path = get_notebook_dir(hf_user_id, notebook_id)
     if os.path.exists(path):
         shutil.rmtree(path)
@@ -1,72 +1,248 @@
 import os
+import threading
 import chromadb
 import uuid
-from typing import List
-from core.embedder import embed_texts, embed_query
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from core.embedder import embed_texts, embed_query, EMBED_BATCH_SIZE
+from core.cache import LRUCache
+from core.exact_index import ExactIndex
+
+# Collections up to this many chunks are searched exactly in memory; bigger ones use Chroma's HNSW
+EXACT_SEARCH_MAX = int(os.environ.get("EXACT_SEARCH_MAX", "10000"))
+# Hold those in-memory vectors as int8 (MiniLM loses well under 1% recall)
+QUANTIZE_EMBEDDINGS = os.environ.get("QUANTIZE_EMBEDDINGS", "1") == "1"
+# Embedding batches per ingest window (one model call + one collection.add each)
+INGEST_WINDOW_BATCHES = 8
+# Rows fetched per collection.get when building the exact index; each page is quantized before the next is read
+EXACT_LOAD_PAGE = 2048
+
+# Graph settings for new collections. Vectors are normalized, so L2 ranks like cosine
+# (and matches the old FAISS behavior); M=32 / ef=200 trade a slower build for better recall
+HNSW_METADATA = {
+    "hnsw:space": "l2",
+    "hnsw:M": int(os.environ.get("HNSW_M", "32")),
+    "hnsw:construction_ef": int(os.environ.get("HNSW_CONSTRUCTION_EF", "200")),
+    "hnsw:search_ef": int(os.environ.get("HNSW_SEARCH_EF", "64")),
+    # Chroma buffers this many new vectors (searched brute-force) before inserting them into the graph,
+    # and persists the graph every sync_threshold inserts; large values turn a bulk ingest into a few
+    # big graph updates + writes instead of one every 100 / 1000 rows
+    "hnsw:batch_size": int(os.environ.get("HNSW_BATCH_SIZE", "1000")),
+    "hnsw:sync_threshold": int(os.environ.get("HNSW_SYNC_THRESHOLD", "5000")),
+}
+
+# Open stores keyed by chroma dir, so repeat requests reuse one PersistentClient per notebook
+_store_cache = LRUCache(maxsize=int(os.environ.get("VECTOR_STORE_CACHE_SIZE", "128")))
+_store_open_lock = threading.Lock()
+
+# One background encoder: the model already uses every core / the whole GPU, so uploads queue here
+# while their previous window is being written to Chroma
+_embed_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
 
 class VectorStore:
-    def __init__(self, db_dir: str):
+    def __init__(self, db_dir: str, exact_search: bool = False):
         """
         Initializes a persistent ChromaDB client for a specific notebook.
         db_dir: The path generated from core.storage_manager.get_chroma_db_dir()
+        exact_search: keep small collections in memory for exact search; only worth it for long-lived stores
         """
         self.db_dir = db_dir
+        self.exact_search = exact_search
         self.client = chromadb.PersistentClient(path=self.db_dir)
         # Get or create the collection for this specific notebook
-        self.collection = self.client.get_or_create_collection(
-            name="notebook_chunks",
-            metadata={"hnsw:space": "l2"} # L2 distance to match the old FAISS behavior
-        )
+        try:
+            self.collection = self.client.get_collection(name="notebook_chunks")
+        except Exception:
+            # New notebook: HNSW build params can only be set when the collection is created
+            self.collection = self.client.get_or_create_collection(name="notebook_chunks", metadata=HNSW_METADATA)
+        # Built lazily on the first search, then kept in sync by add_chunks()
+        self._exact = None
+        self._exact_lock = threading.Lock()
 
-    def add_chunks(self, chunks: List[str], source_filename: str = "Unknown Source"):
+    def _exact_index(self):
+        """Loads every stored vector into an ExactIndex, or returns None if the collection is too big."""
+        if not self.exact_search:
+            return None
+        with self._exact_lock:
+            if self._exact is None:
+                if self.collection.count() > EXACT_SEARCH_MAX:
+                    return None
+                index = ExactIndex(quantize=QUANTIZE_EMBEDDINGS)
+                # Paged, so the float32 copy Chroma hands back never exists for the whole collection at once
+                offset = 0
+                while True:
+                    data = self.collection.get(
+                        include=["embeddings", "documents", "metadatas"], limit=EXACT_LOAD_PAGE, offset=offset
+                    )
+                    if not data["ids"]:
+                        break
+                    index.add(data["embeddings"], data["documents"], data["metadatas"])
+                    offset += len(data["ids"])
+                    if len(data["ids"]) < EXACT_LOAD_PAGE:
+                        break
+                self._exact = index
+            return self._exact
+
+    def add_chunks(self, chunks: List[str], source_filename: str = "Unknown Source", batch_size: int = EMBED_BATCH_SIZE,
+                   sources: Optional[List[str]] = None, on_progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Embeds and stores chunks window by window: each window is one batched model call
+        followed by one collection.add. The next window is encoded on _embed_pool while the
+        current one is inserted, so at most two windows of vectors are held in memory.
+        sources: optional per-chunk file names (overrides source_filename), so a multi-file
+        upload can go in as one batched call and still cite the right file
+        on_progress: called as on_progress(chunks_done, total) after each window
+        Returns the ids the chunks were stored under.
+        """
         if not chunks:
-            return
+            return []
+        if sources is not None and len(sources) != len(chunks):
+            raise ValueError("sources must match chunks")
+
+        # Drop the in-memory index up front if this upload makes the notebook too big for exact search
+        with self._exact_lock:
+            if self._exact is not None and len(self._exact) + len(chunks) > EXACT_SEARCH_MAX:
+                self._exact = None
 
-        # Generate embeddings using our existing sentence-transformer logic
-        embeddings = embed_texts(chunks).tolist()
-        
-        # Generate unique IDs for chroma insertion
         ids = [str(uuid.uuid4()) for _ in chunks]
-        
-        # Provide metadata tracking the original file name so we can cite its chunks
-        metadatas = [{"source": source_filename} for _ in chunks]
-        
-        # Add to the chroma collection
-        self.collection.add(
-            documents=chunks,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
+        step = min(self.client.get_max_batch_size(), batch_size * INGEST_WINDOW_BATCHES)
+        pending = _embed_pool.submit(embed_texts, chunks[:step], batch_size)
+        for i in range(0, len(chunks), step):
+            window = chunks[i:i + step]
+            # numpy goes straight to Chroma; no per-float Python list via .tolist()
+            vectors = pending.result()
+            if i + step < len(chunks):
+                pending = _embed_pool.submit(embed_texts, chunks[i + step:i + 2 * step], batch_size)
+            # Provide metadata tracking the original file name so we can cite its chunks
+            if sources is None:
+                metadatas = [{"source": source_filename} for _ in window]
+            else:
+                metadatas = [{"source": src} for src in sources[i:i + step]]
+            # Write + index append under the lock the lazy build takes: a build either runs before this
+            # window (and it is appended below) or after it (and its paged load picks the window up), never both
+            with self._exact_lock:
+                self.collection.add(
+                    documents=window,
+                    embeddings=vectors,
+                    metadatas=metadatas,
+                    ids=ids[i:i + step],
+                )
+                # Keep the in-memory index current
+                if self._exact is not None:
+                    self._exact.add(vectors, window, metadatas)
+            if on_progress:
+                on_progress(i + len(window), len(chunks))
+        return ids
 
-    def search(self, query: str, top_k: int = 5, include_metadata: bool = False):
+    def delete_chunks(self, ids: List[str]):
+        """Removes chunks stored by add_chunks (e.g. an upload that lost a race to a duplicate)."""
+        if not ids:
+            return
+        with self._exact_lock:
+            self.collection.delete(ids=ids)
+            # ExactIndex is append-only; the next search rebuilds it from the collection
+            self._exact = None
+
+    def embed(self, text: str):
+        """Embeds a query with the same model used for the stored chunks."""
+        return embed_query(text)
+
+    def search(self, query: str, top_k: int = 5, include_metadata: bool = False, query_embedding=None):
         """
         Returns a list of chunks if include_metadata is False
         If include_metadata is True, returns a list of dicts: [{"text": <chunk>, "metadata": <meta>}]
+        query_embedding: optional precomputed vector from embed() to avoid embedding twice
         """
         if self.collection.count() == 0:
             return []
             
         # Embed the query string
-        q_emb = embed_query(query).tolist()
-        
+        if query_embedding is None:
+            query_embedding = embed_query(query)
+        return self._search_vectors([query_embedding], top_k, include_metadata)[0]
+
+    def search_many(self, query_embeddings, top_k: int = 5, include_metadata: bool = False) -> List[list]:
+        """search() for several precomputed query vectors in one pass: one matmul or one Chroma query for all."""
+        if self.collection.count() == 0:
+            return [[] for _ in query_embeddings]
+        return self._search_vectors(query_embeddings, top_k, include_metadata)
+
+    def _search_vectors(self, query_embeddings, top_k: int, include_metadata: bool) -> List[list]:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+
+        # Small notebook: one exact matmul over the cached vectors, no HNSW round-trip
+        index = self._exact_index()
+        if index is not None:
+            out = []
+            for hits in index.search_many(queries, top_k):
+                if include_metadata:
+                    out.append([{"text": index.documents[i], "source": (index.metadatas[i] or {}).get("source", "Unknown")} for i in hits])
+                else:
+                    out.append([index.documents[i] for i in hits])
+            return out
+
         # Query chroma
         results = self.collection.query(
-            query_embeddings=[q_emb],
+            query_embeddings=queries.tolist(),
             n_results=top_k,
             include=["documents", "metadatas"] if include_metadata else ["documents"]
         )
         
-        if not results or not results.get("documents") or not results["documents"][0]:
-            return []
-            
-        docs = results["documents"][0]
-        
-        if include_metadata and results.get("metadatas") and results["metadatas"][0]:
-            metas = results["metadatas"][0]
-            return [{"text": docs[i], "source": metas[i].get("source", "Unknown")} for i in range(len(docs))]
-            
-        return docs
+        if not results or not results.get("documents"):
+            return [[] for _ in queries]
+
+        metadatas = results.get("metadatas") if include_metadata else None
+        out = []
+        for j, docs in enumerate(results["documents"]):
+            docs = docs or []
+            metas = metadatas[j] if metadatas else None
+            if metas:
+                out.append([{"text": docs[i], "source": metas[i].get("source", "Unknown")} for i in range(len(docs))])
+            else:
+                out.append(docs)
+        return out
+
+    def warm(self):
+        """Builds the in-memory exact index now (if the collection is small enough) instead of on the first search."""
+        self._exact_index()
 
     def is_ready(self) -> bool:
         return self.collection.count() > 0
+
+    def source_texts(self, sep: str = "\n\n") -> dict:
+        """
+        {source file name: its chunks joined in insertion order}. Documents + metadatas only,
+        paged like the exact index, so no embeddings cross the client boundary.
+        """
+        parts = {}
+        offset = 0
+        while True:
+            data = self.collection.get(include=["documents", "metadatas"], limit=EXACT_LOAD_PAGE, offset=offset)
+            if not data["ids"]:
+                break
+            for doc, meta in zip(data["documents"], data["metadatas"]):
+                parts.setdefault((meta or {}).get("source", "Unknown Source"), []).append(doc)
+            offset += len(data["ids"])
+            if len(data["ids"]) < EXACT_LOAD_PAGE:
+                break
+        return {source: sep.join(chunks) for source, chunks in parts.items()}
+
+
+def get_vector_store(db_dir: str) -> VectorStore:
+    """Returns the cached VectorStore for db_dir, opening it on first use."""
+    store = _store_cache.get(db_dir)
+    if store is None:
+        # Two threads opening the same notebook must end up sharing one store; otherwise one of them
+        # keeps an in-memory index that never sees the other's add_chunks()
+        with _store_open_lock:
+            store = _store_cache.get(db_dir)
+            if store is None:
+                store = VectorStore(db_dir, exact_search=True)
+                _store_cache.set(db_dir, store)
+    return store
+
+
+def evict_vector_store(db_dir: str):
+    """Forget a cached store, e.g. before its directory is deleted."""
+    _store_cache.pop(db_dir)
@@ -2,9 +2,24 @@
 RAG-based chat: retrieves relevant chunks from vector store, then answers with Groq.
 Maintains conversation history.
 """
-from core.vector_store import VectorStore
+import os
+import re
 from core.groq_client import groq_stream
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Annotation only: importing it pulls in chromadb and the embedding model
+    from core.vector_store import VectorStore
+
+# Context slots given to chunks matching the previous question when the message looks like a follow-up
+# ("and the second one?"), so it still sees what the conversation is about; 0 = current message only
+HISTORY_CONTEXT_K = int(os.environ.get("HISTORY_CONTEXT_K", "2"))
+# A message counts as a follow-up if it opens with one of _FOLLOWUP_LEADS, or is at most
+# FOLLOWUP_MAX_WORDS long and refers back with one of _REFERRING_WORDS ("what does that mean?")
+FOLLOWUP_MAX_WORDS = int(os.environ.get("FOLLOWUP_MAX_WORDS", "8"))
+_FOLLOWUP_LEADS = {"it", "it's", "its", "they", "them", "their", "this", "that", "these", "those", "and", "also", "so", "what about", "how about"}
+_REFERRING_WORDS = {"it", "it's", "its", "they", "them", "their", "this", "that", "these", "those", "he", "she", "his", "her", "one", "ones"}
+_WORD_RE = re.compile(r"[a-z']+")
 
 
 SYSTEM_PROMPT = """You are ThinkBook AI, an intelligent assistant that answers questions 
@@ -19,14 +34,61 @@ Rules:
 - Be thorough but concise."""
 
 
+def is_followup(query: str) -> bool:
+    """Heuristic for messages that lean on the previous turn ("and the second one?", "why is that?")."""
+    words = _WORD_RE.findall(query.lower())
+    if not words:
+        return False
+    if words[0] in _FOLLOWUP_LEADS or " ".join(words[:2]) in _FOLLOWUP_LEADS:
+        return True
+    return len(words) <= FOLLOWUP_MAX_WORDS and any(w in _REFERRING_WORDS for w in words)
+
+
+def retrieve_context(
+    query: str,
+    vector_store: "VectorStore",
+    top_k: int = 6,
+    query_embedding=None,
+    history: Optional[List[dict]] = None,
+) -> List[dict]:
+    """
+    Returns the top_k chunks for the query as [{"text": chunk, "source": filename}, ...]
+    history: earlier turns; for a follow-up message the last user question in it is searched
+    in the same batch and fills up to HISTORY_CONTEXT_K of the slots
+    """
+    prev = next((t["content"] for t in reversed(history or []) if t["role"] == "user"), None)
+    if not prev or HISTORY_CONTEXT_K <= 0 or not is_followup(query):
+        return vector_store.search(query, top_k=top_k, include_metadata=True, query_embedding=query_embedding)
+
+    if query_embedding is None:
+        query_embedding = vector_store.embed(query)
+    # Cheap: the previous question was embedded (and cached) on its own turn
+    current, previous = vector_store.search_many(
+        [query_embedding, vector_store.embed(prev)], top_k=top_k, include_metadata=True
+    )
+    keep = max(top_k - HISTORY_CONTEXT_K, 0)
+    results = current[:keep]
+    seen = {r["text"] for r in results}
+    # Previous-question hits first, then the rest of the current ones if those were duplicates
+    for r in previous + current[keep:]:
+        if len(results) >= top_k:
+            break
+        if r["text"] not in seen:
+            seen.add(r["text"])
+            results.append(r)
+    return results
+
+
 def build_rag_messages(
     query: str,
-    vector_store: VectorStore,
+    vector_store: "VectorStore",
     history: List[dict],
     top_k: int = 6,
+    results: Optional[List[dict]] = None,
 ) -> List[dict]:
-    # Retrieve relevant chunks with metadata
-    results = vector_store.search(query, top_k=top_k, include_metadata=True)
+    # Retrieve relevant chunks with metadata (unless the caller already did)
+    if results is None:
+        results = retrieve_context(query, vector_store, top_k=top_k, history=history)
     
     context_blocks = []
     if results:
@@ -56,7 +118,7 @@ User question: {query}"""
     return messages
 
 
-def stream_chat_response(query: str, vector_store: VectorStore, history: List[dict]):
+def stream_chat_response(query: str, vector_store: "VectorStore", history: List[dict]):
     """
     Generator that yields response tokens one by one.
     """
@@ -9,12 +9,14 @@ Each speaker line is rendered separately and stitched together with pydub.
 
 import re
 from core.groq_client import groq_chat
+from core.chunker import truncate_words
 import io
 import asyncio
-import tempfile
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import torch
-import soundfile as sf
+import numpy as np
 from transformers import VitsModel, AutoTokenizer
 
 
@@ -23,11 +25,16 @@ TTS_MODEL_NAME = "facebook/mms-tts-eng"
 tts_tokenizer = AutoTokenizer.from_pretrained(TTS_MODEL_NAME)
 tts_model = VitsModel.from_pretrained(TTS_MODEL_NAME)
 
+# Script lines synthesized at once; torch releases the GIL inside the model, so lines overlap
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "2"))
+_tts_pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts-line")
+
+# One compiled pattern for both speakers, so each line is matched once
+_SPEAKER_RE = re.compile(r'^(dr\.?\s*sam|alex)\s*:\s*', re.IGNORECASE)
+
 
 def generate_podcast_script(text: str, num_exchanges: int = 12) -> str:
-    words = text.split()
-    if len(words) > 10000:
-        text = " ".join(words[:10000])
+    text = truncate_words(text, 10000)
 
     system_prompt = f"""You are a podcast scriptwriter. Write an engaging, natural podcast 
 conversation between two hosts based on the document content below.
@@ -76,21 +83,21 @@ def parse_podcast_script(script: str) -> list:
         if not line:
             continue
 
-        if re.match(r'^dr\.?\s*sam\s*:', line, re.IGNORECASE):
-            content = re.sub(r'^dr\.?\s*sam\s*:\s*', '', line, flags=re.IGNORECASE).strip()
-            if content:
-                lines.append(("Dr. Sam", content))
-
-        elif re.match(r'^alex\s*:', line, re.IGNORECASE):
-            content = re.sub(r'^alex\s*:\s*', '', line, flags=re.IGNORECASE).strip()
-            if content:
-                lines.append(("Alex", content))
+        match = _SPEAKER_RE.match(line)
+        if not match:
+            continue
+        content = line[match.end():].strip()
+        if content:
+            speaker = "Alex" if match.group(1)[0] in "aA" else "Dr. Sam"
+            lines.append((speaker, content))
 
     return lines
 
 
-def _synthesize_line_local(text: str, output_path: str):
-    """Generate TTS audio locally using Hugging Face VITS model."""
+def _synthesize_line_local(text: str):
+    """Generate TTS audio locally using Hugging Face VITS model; returns a 16 kHz mono AudioSegment."""
+    from pydub import AudioSegment
+
     inputs = tts_tokenizer(text, return_tensors="pt")
 
     with torch.no_grad():
@@ -98,32 +105,52 @@ def _synthesize_line_local(text: str, output_path: str):
 
     waveform = output.squeeze().cpu().numpy()
 
-    # Save WAV temporarily
-    sf.write(output_path, waveform, 16000)
+    # 16-bit PCM straight into pydub, the same samples a WAV file would hold, without writing one
+    pcm = (np.clip(waveform, -1.0, 1.0) * 32767).astype(np.int16)
+    return AudioSegment(pcm.tobytes(), frame_rate=16000, sample_width=2, channels=1)
+
+
+# Bare MPEG frames (no ID3 tag / Xing header) so per-line MP3s concatenate into one playable file
+_STREAM_MP3_PARAMS = ["-write_xing", "0", "-id3v2_version", "0"]
 
 
-async def _build_audio_async(script_lines: list) -> bytes:
+def _iter_line_segments(script_lines: list):
+    """Yields one AudioSegment per script line, prefixed with the pause before it."""
     from pydub import AudioSegment
 
-    combined = AudioSegment.empty()
     pause_same   = AudioSegment.silent(duration=350)
     pause_switch = AudioSegment.silent(duration=650)
 
     prev_speaker = None
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        for i, (speaker, line) in enumerate(script_lines):
-            out_path = os.path.join(tmpdir, f"line_{i}.wav")
-
-            _synthesize_line_local(line, out_path)
-
-            segment = AudioSegment.from_wav(out_path)
+    # Only a few lines run ahead of the one being yielded, so a stopped render stops synthesizing too
+    lookahead = 2 * TTS_WORKERS
+    pending = deque()
+    submitted = 0
+    try:
+        for i, (speaker, _line) in enumerate(script_lines):
+            while submitted < len(script_lines) and submitted < i + lookahead:
+                pending.append(_tts_pool.submit(_synthesize_line_local, script_lines[submitted][1]))
+                submitted += 1
+            segment = pending.popleft().result()
 
             if prev_speaker is not None:
-                combined += pause_switch if prev_speaker != speaker else pause_same
+                segment = (pause_switch if prev_speaker != speaker else pause_same) + segment
 
-            combined += segment
             prev_speaker = speaker
+            yield segment
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def build_podcast_audio(script_lines: list) -> bytes:
+    """Converts the parsed script into one stitched MP3. Blocking (TTS + encode): run it off the event loop."""
+    from pydub import AudioSegment
+
+    combined = AudioSegment.empty()
+    for segment in _iter_line_segments(script_lines):
+        combined += segment
 
     buf = io.BytesIO()
     combined.export(buf, format="mp3", bitrate="128k")
@@ -131,8 +158,20 @@ async def _build_audio_async(script_lines: list) -> bytes:
     return buf.read()
 
 
+def iter_podcast_audio(script_lines: list):
+    """
+    Streaming variant of generate_podcast_audio: yields MP3 bytes one script line at a time,
+    so playback can start before the whole episode is synthesized.
+    """
+    for segment in _iter_line_segments(script_lines):
+        buf = io.BytesIO()
+        segment.export(buf, format="mp3", bitrate="128k", parameters=_STREAM_MP3_PARAMS)
+        yield buf.getvalue()
+
+
 async def generate_podcast_audio(script_lines: list) -> bytes:
     """
     Public entry point: converts parsed script into a dual-voice stitched MP3.
+    The synthesis runs in a worker thread, so awaiting it doesn't stall the event loop.
     """
-    return await _build_audio_async(script_lines)
+    return await asyncio.to_thread(build_podcast_audio, script_lines)
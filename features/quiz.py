@@ -2,9 +2,9 @@
 Generates a multiple-choice quiz from document content.
 Handles answer checking and scoring.
 """
-import json
-import re
+import orjson
 from core.groq_client import groq_chat
+from core.chunker import truncate_words
 
 
 def generate_quiz(text: str, num_questions: int = 5) -> list:
@@ -17,9 +17,7 @@ def generate_quiz(text: str, num_questions: int = 5) -> list:
       "explanation": str
     }
     """
-    words = text.split()
-    if len(words) > 10000:
-        text = " ".join(words[:10000])
+    text = truncate_words(text, 10000)
 
     system_prompt = f"""You are a quiz master. Based on the document content, generate exactly {num_questions} 
 multiple-choice questions that test genuine comprehension.
@@ -54,28 +52,52 @@ Rules:
     ]
 
     raw = groq_chat(messages, temperature=0.4, max_tokens=3000)
+    return parse_quiz(raw)
 
+
+def _parse_failed() -> list:
+    return [
+        {
+            "question": "Could not parse quiz. Please try regenerating.",
+            "options": {"A": "Regenerate", "B": "-", "C": "-", "D": "-"},
+            "answer": "A",
+            "explanation": "Quiz generation encountered a parsing error. Try again.",
+        }
+    ]
+
+
+def parse_quiz(raw: str) -> list:
+    """Model output -> list of question dicts with normalized answers, or the parse-error placeholder."""
     # Extract JSON from response
     try:
-        match = re.search(r'\[.*\]', raw, re.DOTALL)
-        if match:
-            return json.loads(match.group())
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        return [
-            {
-                "question": "Could not parse quiz. Please try regenerating.",
-                "options": {"A": "Regenerate", "B": "-", "C": "-", "D": "-"},
-                "answer": "A",
-                "explanation": "Quiz generation encountered a parsing error. Try again.",
-            }
-        ]
+        # Same span as re.search(r'\[.*\]', raw, re.DOTALL): first "[" to last "]"
+        start, end = raw.find("["), raw.rfind("]")
+        if start != -1 and end > start:
+            quiz = orjson.loads(raw[start:end + 1])
+        else:
+            quiz = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return _parse_failed()
+
+    # Valid JSON isn't necessarily a quiz: anything without an answer per question is treated as a parse failure
+    if not isinstance(quiz, list) or not all(isinstance(q, dict) and q.get("answer") is not None for q in quiz):
+        return _parse_failed()
+
+    # Normalized once here and cached that way, so grading is a plain compare of letters
+    for q in quiz:
+        q["answer"] = answer_letter(q["answer"])
+        q.setdefault("explanation", "")
+    return quiz
+
+
+def answer_letter(answer) -> str:
+    """'b', 'B)' or ' B: ...' -> 'B'."""
+    return str(answer).strip()[:1].upper()
 
 
 def check_answer(question_dict: dict, user_answer: str) -> tuple:
     """
     Returns (is_correct: bool, explanation: str)
     """
-    correct = question_dict["answer"]
-    is_correct = user_answer.upper() == correct.upper()
+    is_correct = answer_letter(user_answer) == answer_letter(question_dict["answer"])
     return is_correct, question_dict.get("explanation", "")
@@ -1,13 +1,13 @@
 """
 Generates a structured study guide with key concepts, definitions, and flashcards.
 """
-from core.groq_client import groq_chat
+from core.groq_client import groq_chat, groq_stream
+from core.chunker import truncate_words
 
 
-def generate_study_guide(text: str) -> str:
-    words = text.split()
-    if len(words) > 10000:
-        text = " ".join(words[:10000])
+def generate_study_guide(text: str, stream: bool = False):
+    """stream: return a token generator instead of the finished string"""
+    text = truncate_words(text, 10000)
 
     system_prompt = """You are an expert educator. Generate a comprehensive study guide 
 from the provided document. Structure it as follows using markdown:
@@ -46,4 +46,6 @@ Use markdown formatting throughout. Be comprehensive and educational."""
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": f"Document:\n\n{text}"},
     ]
+    if stream:
+        return groq_stream(messages, temperature=0.5, max_tokens=3000)
     return groq_chat(messages, temperature=0.5, max_tokens=3000)
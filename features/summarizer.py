@@ -1,17 +1,19 @@
 """
 Generates brief or descriptive summaries of the full document text.
 """
-from core.groq_client import groq_chat
+from core.groq_client import groq_chat, groq_stream
+from core.chunker import truncate_words
 
 
-def summarize(text: str, mode: str = "brief") -> str:
+def summarize(text: str, mode: str = "brief", stream: bool = False):
     """
     mode: 'brief' (3-5 sentences) or 'descriptive' (detailed, structured)
+    stream: return a token generator instead of the finished string
     """
     # Truncate text to ~12000 words to fit context window
-    words = text.split()
-    if len(words) > 12000:
-        text = " ".join(words[:12000]) + "\n\n[... document truncated for summarization ...]"
+    short = truncate_words(text, 12000)
+    if short is not text:
+        text = short + "\n\n[... document truncated for summarization ...]"
 
     if mode == "brief":
         instruction = (
@@ -34,4 +36,6 @@ def summarize(text: str, mode: str = "brief") -> str:
         {"role": "system", "content": instruction},
         {"role": "user", "content": f"Document:\n\n{text}"},
     ]
+    if stream:
+        return groq_stream(messages, temperature=0.4, max_tokens=2048)
     return groq_chat(messages, temperature=0.4, max_tokens=2048)
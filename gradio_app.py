@@ -5,11 +5,23 @@ Provides the Gradio UI and communicates with the FastAPI backend via HTTP reques
 import fix_gradio
 import gradio as gr
 import requests
-import json
+import orjson
 import os
+import time
+import atexit
+import shutil
+import tempfile
+import uuid
 
 API_BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:8000")
 
+# Re-render the chatbot at most this often while a reply streams in
+STREAM_FLUSH_SECS = 0.05
+
+# One scratch dir for downloads/audio handed to Gradio, created once and removed on exit
+_TMP_DIR = tempfile.mkdtemp(prefix="thinkbook_")
+atexit.register(shutil.rmtree, _TMP_DIR, ignore_errors=True)
+
 def get_headers(profile: gr.OAuthProfile | None) -> dict:
     if not profile:
         return {}
@@ -17,34 +29,69 @@ def get_headers(profile: gr.OAuthProfile | None) -> dict:
 
 def fetch_notebooks_with_selection(profile: gr.OAuthProfile | None, selected_title: str | None = None):
     if not profile:
-        return gr.Dropdown(choices=[], value=None)
+        return gr.update(choices=[], value=None)
     try:
         res = requests.get(f"{API_BASE_URL}/api/notebooks", headers=get_headers(profile))
         if res.status_code == 200:
             notebooks = res.json()
             choices = [nb["title"] for nb in notebooks]
             target_val = selected_title if selected_title in choices else (choices[0] if choices else None)
-            return gr.Dropdown(choices=choices, value=target_val)
+            return gr.update(choices=choices, value=target_val)
     except Exception as e:
         print(f"Error fetching notebooks: {e}")
-    return gr.Dropdown(choices=[], value=None)
+    return gr.update(choices=[], value=None)
 
 def fetch_notebooks(profile: gr.OAuthProfile | None):
     return fetch_notebooks_with_selection(profile)
 
+def iter_sse_tokens(res):
+    """Yields tokens from the /api/chat server-sent event stream."""
+    for line in res.iter_lines():
+        if line.startswith(b"data: "):
+            yield orjson.loads(line[6:])["token"]
+
+def _open_tempfile(suffix: str):
+    """Opens a fresh file in _TMP_DIR for writing; returns (fd, path)."""
+    path = os.path.join(_TMP_DIR, f"{uuid.uuid4().hex}{suffix}")
+    return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), path
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+def save_stream_to_tempfile(res, suffix: str) -> str:
+    """Copies a streamed (stream=True) response body into a tempfile piece by piece; returns its path."""
+    fd, path = _open_tempfile(suffix)
+    try:
+        for piece in res.iter_content(chunk_size=1 << 16):
+            _write_all(fd, piece)
+    finally:
+        os.close(fd)
+    return path
+
+def save_text_tempfile(text: str, suffix: str = ".md") -> str:
+    """Writes text to a tempfile for a download button; returns its path."""
+    fd, path = _open_tempfile(suffix)
+    try:
+        _write_all(fd, text.encode("utf-8"))
+    finally:
+        os.close(fd)
+    return path
+
 
 def process_source(notebook_name, source_type, file_objs, url_text, profile: gr.OAuthProfile | None):
     if not profile:
-        return "❌ Please log in with Hugging Face first.", gr.Dropdown()
+        return "❌ Please log in with Hugging Face first.", gr.update()
         
     name = notebook_name.strip()
     if not name:
-        return "❌ Please enter a notebook name.", gr.Dropdown()
+        return "❌ Please enter a notebook name.", gr.update()
 
     try:
         if source_type in ["PDF", "PPTX", "TXT"]:
             if not file_objs:
-                return "❌ Please upload a file.", gr.Dropdown()
+                return "❌ Please upload a file.", gr.update()
             
             # Use the first file for MVP presentation
             file_obj = file_objs[0] if isinstance(file_objs, list) else file_objs
@@ -75,7 +122,7 @@ def process_source(notebook_name, source_type, file_objs, url_text, profile: gr.
                 return f"❌ Server Error: {res.text}", fetch_notebooks_with_selection(profile, name)
         elif source_type == "URL":
             if not url_text or not url_text.strip().startswith("http"):
-                return "❌ Please enter a valid URL (http/https).", gr.Dropdown()
+                return "❌ Please enter a valid URL (http/https).", gr.update()
                 
             data = {"notebook_name": name, "url": url_text.strip()}
             
@@ -139,12 +186,22 @@ def chat_response(message, history, notebook_name, profile: gr.OAuthProfile | No
             "notebook_id": notebook_id,
             "message": message
         }
-        res = requests.post(f"{API_BASE_URL}/api/chat", headers=get_headers(profile), json=payload)
+        res = requests.post(f"{API_BASE_URL}/api/chat", headers=get_headers(profile), json=payload, stream=True)
         
         if res.status_code == 200:
-            ans = res.json().get("response", "")
+            # Render tokens as they arrive, flushing at most every STREAM_FLUSH_SECS
             history.append({"role": "user", "content": message})
-            history.append({"role": "assistant", "content": ans})
+            history.append({"role": "assistant", "content": ""})
+            parts = []
+            last_flush = 0.0
+            for token in iter_sse_tokens(res):
+                parts.append(token)
+                now = time.monotonic()
+                if now - last_flush >= STREAM_FLUSH_SECS:
+                    history[-1]["content"] = "".join(parts)
+                    last_flush = now
+                    yield history, ""
+            history[-1]["content"] = "".join(parts)
             yield history, ""
         else:
             history.append({"role": "user", "content": message})
@@ -168,10 +225,7 @@ def generate_summary(notebook_name, mode, profile: gr.OAuthProfile | None):
     res = requests.post(f"{API_BASE_URL}/api/generate", headers=get_headers(profile), json={"notebook_id": nb_id, "artifact_type": "summary", "params": {"mode": mode}})
     out_md = res.json().get("result", f"❌ Error: {res.text}")
     
-    import tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as f:
-        f.write(out_md)
-        return out_md, gr.update(value=f.name, visible=True)
+    return out_md, gr.update(value=save_text_tempfile(out_md), visible=True)
 
 def generate_podcast(notebook_name, exchanges, profile: gr.OAuthProfile | None):
     if not profile or not notebook_name: return "❌ Log in and select a notebook.", None, None
@@ -183,10 +237,7 @@ def generate_podcast(notebook_name, exchanges, profile: gr.OAuthProfile | None):
     if res.status_code != 200: return f"❌ Error: {res.text}", None, None
     d = res.json()
     script_md = d.get("script", "")
-    import tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as f:
-        f.write(script_md)
-        return script_md, d.get("parsed_lines", []), gr.update(value=f.name, visible=True)
+    return script_md, d.get("parsed_lines", []), gr.update(value=save_text_tempfile(script_md), visible=True)
 
 def generate_audio(parsed_lines, notebook_name, profile: gr.OAuthProfile | None):
     if not parsed_lines: return None, "❌ No script generated yet."
@@ -199,14 +250,13 @@ def generate_audio(parsed_lines, notebook_name, profile: gr.OAuthProfile | None)
     res = requests.post(
         f"{API_BASE_URL}/api/generate", 
         headers=get_headers(profile), 
-        json={"notebook_id": nb_id, "artifact_type": "podcast_audio", "params": {"parsed_lines": parsed_lines}}
+        json={"notebook_id": nb_id, "artifact_type": "podcast_audio", "params": {"parsed_lines": parsed_lines}},
+        stream=True,
     )
     if res.status_code != 200: return None, f"❌ Error: {res.text}"
     
-    import tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as f:
-        f.write(res.content)
-        return f.name, "✅ Audio ready!"
+    # The backend sends the MP3 straight from disk; write it out as it arrives instead of buffering it
+    return save_stream_to_tempfile(res, ".mp3"), "✅ Audio ready!"
 
 MAX_QUIZ_Q = 10
 def gen_quiz(notebook_name, num_q, profile: gr.OAuthProfile | None):
@@ -220,35 +270,32 @@ def gen_quiz(notebook_name, num_q, profile: gr.OAuthProfile | None):
     if res.status_code != 200: return f"❌ Error: {res.text}", "{}", "", "", None, *radios
     
     quiz_data = res.json().get("quiz", [])
-    md = ""
+    parts = []
     for i, q in enumerate(quiz_data[:MAX_QUIZ_Q]):
-        md += f"**{i+1}. {q['question']}**\n\n"
-        for k, v in q['options'].items():
-             md += f"- **{k})** {v}\n"
-        md += "\n---\n"
+        parts.append(f"**{i+1}. {q['question']}**\n\n")
+        parts.extend(f"- **{k})** {v}\n" for k, v in q['options'].items())
+        parts.append("\n---\n")
         radios[i] = gr.update(visible=True, choices=["A", "B", "C", "D"], label=f"Q{i+1}")
+    md = "".join(parts)
         
-    import tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as f:
-        f.write(md)
-        return "✅ Quiz Ready!", json.dumps(quiz_data), md, "", gr.update(value=f.name, visible=True), *radios
+    return "✅ Quiz Ready!", orjson.dumps(quiz_data).decode(), md, "", gr.update(value=save_text_tempfile(md), visible=True), *radios
 
 def submit_quiz(quiz_json, *answers):
-    quiz_data = json.loads(quiz_json)
+    quiz_data = orjson.loads(quiz_json)
     if not quiz_data: return "❌ No quiz active."
     score = 0
-    md = "### Results\n"
+    parts = ["### Results\n"]
     for i, q in enumerate(quiz_data):
         if i >= len(answers) or not answers[i]: continue
         user_ans = answers[i]
         correct_ans = q["answer"]
         if user_ans == correct_ans:
             score += 1
-            md += f"✅ **Q{i+1} Correct!** ({user_ans})\n{q.get('explanation', '')}\n\n"
+            parts.append(f"✅ **Q{i+1} Correct!** ({user_ans})\n{q.get('explanation', '')}\n\n")
         else:
-            md += f"❌ **Q{i+1} Incorrect.** You chose {user_ans}, correct was {correct_ans}.\n{q.get('explanation', '')}\n\n"
-    md = f"**Final Score:** {score}/{len(quiz_data)}\n\n" + md
-    return md
+            parts.append(f"❌ **Q{i+1} Incorrect.** You chose {user_ans}, correct was {correct_ans}.\n{q.get('explanation', '')}\n\n")
+    # Score goes on top, but is only known after the loop
+    return f"**Final Score:** {score}/{len(quiz_data)}\n\n" + "".join(parts)
 
 def generate_study_guide(notebook_name, profile: gr.OAuthProfile | None):
     if not profile or not notebook_name: return "❌ Log in and select a notebook."
@@ -284,61 +331,51 @@ def load_notebook_data(nb_name, profile: gr.OAuthProfile | None):
     artifacts = res_artifacts.json() if res_artifacts.status_code == 200 else {}
     
     sum_val = next((v for k, v in artifacts.items() if k.startswith("summary")), "")
-    pod_script_val = next((json.loads(v).get("script", "") for k, v in artifacts.items() if k.startswith("podcast_script")), "")
-    pod_lines_val = next((json.loads(v).get("parsed_lines", []) for k, v in artifacts.items() if k.startswith("podcast_script")), None)
-    quiz_val = next((json.loads(v).get("quiz", []) for k, v in artifacts.items() if k.startswith("quiz")), [])
+    pod_script_val = next((orjson.loads(v).get("script", "") for k, v in artifacts.items() if k.startswith("podcast_script")), "")
+    pod_lines_val = next((orjson.loads(v).get("parsed_lines", []) for k, v in artifacts.items() if k.startswith("podcast_script")), None)
+    quiz_val = next((orjson.loads(v).get("quiz", []) for k, v in artifacts.items() if k.startswith("quiz")), [])
     
-    quiz_json_val = json.dumps(quiz_val) if quiz_val else "{}"
+    quiz_json_val = orjson.dumps(quiz_val).decode() if quiz_val else "{}"
     quiz_display = ""
     quiz_results_clear = ""
     radios = empty_radios.copy()
     if quiz_val:
+        parts = []
         for i, q in enumerate(quiz_val[:MAX_QUIZ_Q]):
-            quiz_display += f"**Q{i+1}: {q.get('question', '')}**\n\n"
-            for k, v in q.get('options', {}).items():
-                 quiz_display += f"- **{k})** {v}\n"
-            quiz_display += "\n---\n"
+            parts.append(f"**Q{i+1}: {q.get('question', '')}**\n\n")
+            parts.extend(f"- **{k})** {v}\n" for k, v in q.get('options', {}).items())
+            parts.append("\n---\n")
             radios[i] = gr.update(visible=True, choices=["A", "B", "C", "D"], label=f"Q{i+1}", value=None)
+        quiz_display = "".join(parts)
             
             
     study_val = next((v for k, v in artifacts.items() if k.startswith("study_guide")), "")
     
-    # Audio uses a different DB persistence pattern (raw bytes as text in our simple mapping), 
-    # but since we serve it as a file path in Gradio, we must write it to a tempfile if it exists.
+    # Audio is stored as an MP3 on the backend; the artifacts map only tells us where to download it.
+    # Gradio serves it as a file path, so pull it into a tempfile if it exists.
     audio_val = None
-    audio_b64 = next((v for k, v in artifacts.items() if k.startswith("podcast_audio")), None)
-    if audio_b64:
-        import base64
-        import tempfile
+    audio_url = next((v for k, v in artifacts.items() if k.startswith("podcast_audio")), None)
+    if audio_url:
         try:
-            audio_bytes = base64.b64decode(audio_b64)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as f:
-                f.write(audio_bytes)
-                audio_val = f.name
+            res_audio = requests.get(f"{API_BASE_URL}{audio_url}", headers=get_headers(profile), stream=True)
+            if res_audio.status_code == 200:
+                audio_val = save_stream_to_tempfile(res_audio, ".mp3")
         except Exception as e:
-            print("Failed to decode cached audio", e)
+            print("Failed to fetch cached audio", e)
             pass
     
     # Save files to temp for downloading
-    import tempfile
-    
     sum_btn_update = gr.update(visible=False)
     if sum_val:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as f:
-            f.write(sum_val)
-            sum_btn_update = gr.update(value=f.name, visible=True)
+        sum_btn_update = gr.update(value=save_text_tempfile(sum_val), visible=True)
             
     pod_btn_update = gr.update(visible=False)
     if pod_script_val:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as f:
-            f.write(pod_script_val)
-            pod_btn_update = gr.update(value=f.name, visible=True)
+        pod_btn_update = gr.update(value=save_text_tempfile(pod_script_val), visible=True)
             
     quiz_btn_update = gr.update(visible=False)
     if quiz_display:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as f:
-            f.write(quiz_display)
-            quiz_btn_update = gr.update(value=f.name, visible=True)
+        quiz_btn_update = gr.update(value=save_text_tempfile(quiz_display), visible=True)
     
     return f"Selected: **{nb_name}**", files, chats, sum_val, sum_btn_update, pod_script_val, pod_lines_val, pod_btn_update, quiz_display, quiz_json_val, study_val, quiz_btn_update, audio_val, quiz_results_clear, *radios
 
@@ -568,4 +605,6 @@ with gr.Blocks(title="ThinkBook 🧠") as demo:
     demo.load(fetch_notebooks, inputs=None, outputs=active_nb)
 
 if __name__ == "__main__":
+    # Queueing is what lets generator handlers (streaming chat) push partial updates
+    demo.queue()
     demo.launch()
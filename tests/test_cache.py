@@ -0,0 +1,55 @@
+"""Basic tests for cache module."""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from core.cache import LRUCache
+
+
+def test_lru_eviction_by_size():
+    cache = LRUCache(maxsize=10, getsizeof=len)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    assert cache.get("a") == b"12345"  # touch "a" so "b" is now the oldest
+    cache.set("c", b"123")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert cache.currsize == 8
+
+
+def test_oversized_value_is_not_cached():
+    cache = LRUCache(maxsize=4, getsizeof=len)
+    cache.set("small", "ab")
+    cache.set("huge", "abcdefgh")
+    assert cache.get("huge") is None
+    assert cache.get("small") == "ab"
+
+
+def test_oversized_value_drops_stale_entry():
+    cache = LRUCache(maxsize=4, getsizeof=len)
+    cache.set("k", "ab")
+    cache.set("k", "abcdefgh")
+    assert cache.get("k") is None
+    assert cache.currsize == 0
+
+
+def test_invalidate_prefix_and_ttl():
+    cache = LRUCache(maxsize=10)
+    cache.set(("user", "nb1", "summary"), "x")
+    cache.set(("user", "nb1", "quiz_5"), "y")
+    cache.set(("user", "nb2", "summary"), "z")
+    cache.invalidate_prefix(("user", "nb1"))
+    assert len(cache) == 1
+    assert cache.get(("user", "nb2", "summary")) == "z"
+
+    cache = LRUCache(maxsize=10, ttl=-1)
+    cache.set("k", "v")
+    assert cache.get("k") is None
+
+
+if __name__ == "__main__":
+    test_lru_eviction_by_size()
+    test_oversized_value_is_not_cached()
+    test_oversized_value_drops_stale_entry()
+    test_invalidate_prefix_and_ttl()
+    print("All cache tests passed!")
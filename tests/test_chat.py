@@ -0,0 +1,61 @@
+"""Basic tests for chat retrieval."""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from features.chat import retrieve_context, is_followup
+
+
+class FakeStore:
+    """Hits are canned per query text; the embedding is just the text itself."""
+    def __init__(self, hits):
+        self.hits = hits
+        self.calls = []
+
+    def embed(self, text):
+        return text
+
+    def search(self, query, top_k=5, include_metadata=False, query_embedding=None):
+        self.calls.append("search")
+        return self.hits[query][:top_k]
+
+    def search_many(self, query_embeddings, top_k=5, include_metadata=False):
+        self.calls.append("search_many")
+        return [self.hits[q][:top_k] for q in query_embeddings]
+
+
+def _hits(prefix, n=6):
+    return [{"text": f"{prefix}{i}", "source": "doc"} for i in range(n)]
+
+
+def test_is_followup():
+    assert is_followup("And the second one?")
+    assert is_followup("What about the costs?")
+    assert is_followup("Why is that?")
+    assert not is_followup("What is photosynthesis?")
+    assert not is_followup("Explain how the treaty of Versailles shaped European borders after the war")
+
+
+def test_new_question_uses_current_hits_only():
+    history = [{"role": "user", "content": "Tell me about cells"}, {"role": "assistant", "content": "..."}]
+    store = FakeStore({"What is photosynthesis?": _hits("cur"), "Tell me about cells": _hits("prev")})
+    results = retrieve_context("What is photosynthesis?", store, top_k=6, history=history)
+    assert [r["text"] for r in results] == [f"cur{i}" for i in range(6)]
+    assert store.calls == ["search"]
+
+
+def test_followup_mixes_previous_question_hits():
+    history = [{"role": "user", "content": "Tell me about cells"}, {"role": "assistant", "content": "..."}]
+    previous = [{"text": "cur0", "source": "doc"}] + _hits("prev")
+    store = FakeStore({"And the second one?": _hits("cur"), "Tell me about cells": previous})
+    results = retrieve_context("And the second one?", store, top_k=6, history=history)
+    # 4 current slots, then previous-question hits with the duplicate cur0 skipped
+    assert [r["text"] for r in results] == ["cur0", "cur1", "cur2", "cur3", "prev0", "prev1"]
+    assert store.calls == ["search_many"]
+
+
+if __name__ == "__main__":
+    test_is_followup()
+    test_new_question_uses_current_hits_only()
+    test_followup_mixes_previous_question_hits()
+    print("All chat tests passed!")
@@ -3,7 +3,8 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from core.chunker import chunk_text
+import core.chunker
+from core.chunker import chunk_text, count_words, dedupe_chunks, truncate_words
 
 
 def test_chunk_basic():
@@ -27,8 +28,55 @@ def test_chunk_short_text():
     assert chunks[0] == text
 
 
+def test_chunk_matches_word_slices():
+    # Chunks are built lazily now; they must still be words[start:start + size] for every start
+    words = [f"w{i}" for i in range(1234)]
+    text = "\n".join(words)
+    chunks = chunk_text(text, chunk_size=100, overlap=10)
+    expected = [" ".join(words[s:s + 100]) for s in range(0, len(words), 90)]
+    assert chunks == expected
+    assert count_words(text) == len(words)
+
+
+def test_chunk_across_split_blocks():
+    # Tiny blocks so words and windows straddle block boundaries
+    text = "  ".join(f"w{i}\n" for i in range(777))
+    expected = chunk_text(text, chunk_size=50, overlap=5)
+    saved = core.chunker.SPLIT_BLOCK
+    core.chunker.SPLIT_BLOCK = 7
+    try:
+        assert chunk_text(text, chunk_size=50, overlap=5) == expected
+        assert count_words(text) == 777
+    finally:
+        core.chunker.SPLIT_BLOCK = saved
+
+
+def test_dedupe_chunks_keeps_first_occurrence():
+    seen = set()
+    assert dedupe_chunks(["Header page", "body one", "HEADER PAGE", "body two"], seen) == ["Header page", "body one", "body two"]
+    # A second source sharing the set only keeps what the first one didn't have
+    assert dedupe_chunks(["body one", "body three"], seen) == ["body three"]
+
+
+def test_truncate_words():
+    text = "one  two\nthree four five"
+    assert truncate_words(text, 5) is text
+    assert truncate_words(text, 3) == "one two three"
+
+    saved = core.chunker.SPLIT_BLOCK
+    core.chunker.SPLIT_BLOCK = 4
+    try:
+        assert truncate_words(text, 4) == "one two three four"
+    finally:
+        core.chunker.SPLIT_BLOCK = saved
+
+
 if __name__ == "__main__":
     test_chunk_basic()
     test_chunk_overlap()
     test_chunk_short_text()
+    test_chunk_matches_word_slices()
+    test_chunk_across_split_blocks()
+    test_dedupe_chunks_keeps_first_occurrence()
+    test_truncate_words()
     print("All chunker tests passed!")
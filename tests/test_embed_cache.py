@@ -0,0 +1,62 @@
+"""Basic tests for embed_cache module."""
+import sys
+import os
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from core.embed_cache import EmbedCache
+
+
+class FakeModel:
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, texts):
+        self.seen.extend(texts)
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+def test_only_misses_are_embedded():
+    cache = EmbedCache(os.path.join(tempfile.mkdtemp(), "emb.sqlite"))
+    model = FakeModel()
+    first = cache.embed(["aa", "bbb", "aa"], "m", model)
+    assert model.seen == ["aa", "bbb"]
+    assert first.shape == (3, 3) and first[0][0] == 2 and first[1][0] == 3
+
+    second = cache.embed(["bbb", "cccc"], "m", model)
+    assert model.seen == ["aa", "bbb", "cccc"]
+    assert np.array_equal(second[0], first[1])
+
+
+def test_model_name_is_part_of_the_key():
+    cache = EmbedCache(os.path.join(tempfile.mkdtemp(), "emb.sqlite"))
+    model = FakeModel()
+    cache.embed(["text"], "model-a", model)
+    cache.embed(["text"], "model-b", model)
+    assert model.seen == ["text", "text"]
+
+def test_least_recently_used_pruned_past_max_rows():
+    cache = EmbedCache(os.path.join(tempfile.mkdtemp(), "emb.sqlite"), max_rows=2)
+    model = FakeModel()
+    cache.embed(["a"], "m", model)
+    cache.embed(["bb"], "m", model)
+    time.sleep(0.01)
+    cache.embed(["a"], "m", model)  # hit: "bb" is now the least recently used
+    time.sleep(0.01)
+    cache.embed(["ccc"], "m", model)
+    assert model.seen == ["a", "bb", "ccc"]
+
+    cache.embed(["a", "ccc"], "m", model)
+    assert model.seen == ["a", "bb", "ccc"]
+    cache.embed(["bb"], "m", model)
+    assert model.seen == ["a", "bb", "ccc", "bb"]
+
+
+if __name__ == "__main__":
+    test_only_misses_are_embedded()
+    test_model_name_is_part_of_the_key()
+    test_least_recently_used_pruned_past_max_rows()
+    print("All embed cache tests passed!")
@@ -0,0 +1,47 @@
+"""Basic tests for exact_index module."""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from core.exact_index import ExactIndex
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(200, 16)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    index = ExactIndex()
+    index.add(vecs[:150], [f"doc{i}" for i in range(150)])
+    index.add(vecs[150:], [f"doc{i}" for i in range(150, 200)])
+
+    q = rng.normal(size=16).astype(np.float32)
+    expected = np.argsort(-(vecs @ (q / np.linalg.norm(q))))[:5].tolist()
+    assert index.search(q, top_k=5) == expected
+
+
+def test_small_and_empty_index():
+    index = ExactIndex()
+    assert index.search(np.ones(4), top_k=3) == []
+    index.add(np.eye(2, 4), ["a", "b"], [{"source": "x"}, {"source": "y"}])
+    assert index.search(np.array([0.0, 1.0, 0.0, 0.0]), top_k=10) == [1, 0]
+    assert index.metadatas[1]["source"] == "y"
+
+
+def test_search_many_matches_single_searches():
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(300, 16)).astype(np.float32)
+    qs = rng.normal(size=(3, 16)).astype(np.float32)
+    for quantize in (False, True):
+        index = ExactIndex(quantize=quantize)
+        index.add(vecs, [f"doc{i}" for i in range(300)])
+        assert index.search_many(qs, top_k=4) == [index.search(q, top_k=4) for q in qs]
+    assert ExactIndex().search_many(qs, top_k=4) == [[], [], []]
+
+
+if __name__ == "__main__":
+    test_search_matches_brute_force()
+    test_small_and_empty_index()
+    test_search_many_matches_single_searches()
+    print("All exact index tests passed!")
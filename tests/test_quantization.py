@@ -0,0 +1,39 @@
+"""Basic tests for quantization module."""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from core.quantization import quantize_int8, dequantize_int8
+from core.exact_index import ExactIndex
+
+
+def test_roundtrip_error_is_small():
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(50, 384)).astype(np.float32)
+    codes, scales = quantize_int8(vecs)
+    assert codes.dtype == np.int8 and scales.shape == (50,)
+    err = np.abs(dequantize_int8(codes, scales) - vecs).max(axis=1)
+    assert np.all(err <= scales / 2 + 1e-6)
+
+
+def test_quantized_index_recall():
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(2000, 384)).astype(np.float32)
+    docs = [str(i) for i in range(len(vecs))]
+    exact, quant = ExactIndex(), ExactIndex(quantize=True)
+    exact.add(vecs, docs)
+    quant.add(vecs, docs)
+    assert quant.nbytes < exact.nbytes / 3
+
+    hits = 0
+    for q in rng.normal(size=(20, 384)):
+        hits += len(set(exact.search(q, 10)) & set(quant.search(q, 10)))
+    assert hits / 200 >= 0.9
+
+
+if __name__ == "__main__":
+    test_roundtrip_error_is_small()
+    test_quantized_index_recall()
+    print("All quantization tests passed!")
@@ -0,0 +1,31 @@
+"""Basic tests for quiz module."""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from features.quiz import parse_quiz, answer_letter, check_answer
+
+
+def test_parse_quiz_normalizes_answers():
+    raw = 'Here you go: [{"question": "Q?", "options": {"A": "x", "B": "y", "C": "z", "D": "w"}, "answer": "b)"}]'
+    quiz = parse_quiz(raw)
+    assert quiz[0]["answer"] == "B"
+    assert quiz[0]["explanation"] == ""
+    assert check_answer(quiz[0], "B: y") == (True, "")
+
+
+def test_parse_quiz_rejects_malformed_json():
+    for raw in ("not json", '{"question": "Q?", "answer": "A"}', '[{"question": "Q?"}]', '["A"]'):
+        assert parse_quiz(raw)[0]["question"].startswith("Could not parse quiz")
+
+
+def test_answer_letter_non_str():
+    assert answer_letter(3) == "3"
+    assert answer_letter(" c ") == "C"
+
+
+if __name__ == "__main__":
+    test_parse_quiz_normalizes_answers()
+    test_parse_quiz_rejects_malformed_json()
+    test_answer_letter_non_str()
+    print("All quiz tests passed!")
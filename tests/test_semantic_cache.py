@@ -0,0 +1,51 @@
+"""Basic tests for semantic_cache module."""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from core.semantic_cache import SemanticCache
+
+
+def test_near_duplicate_hits():
+    cache = SemanticCache(threshold=0.95)
+    emb = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    cache.store("nb", emb, [], "cached answer")
+    hit = cache.lookup("nb", np.array([0.99, 0.05, 0.0], dtype=np.float32))
+    assert hit is not None
+    assert hit.response == "cached answer"
+
+
+def test_dissimilar_misses():
+    cache = SemanticCache(threshold=0.95)
+    cache.store("nb", np.array([1.0, 0.0, 0.0]), [], "cached answer")
+    assert cache.lookup("nb", np.array([0.0, 1.0, 0.0])) is None
+
+
+def test_namespaces_are_isolated():
+    cache = SemanticCache()
+    cache.store("nb1", np.array([1.0, 0.0]), [], "answer")
+    assert cache.lookup("nb2", np.array([1.0, 0.0])) is None
+    cache.invalidate("nb1")
+    assert cache.lookup("nb1", np.array([1.0, 0.0])) is None
+
+
+def test_ttl_and_lru_eviction():
+    cache = SemanticCache(max_entries=2, ttl=-1)
+    cache.store("nb", np.array([1.0, 0.0]), [], "stale")
+    assert cache.lookup("nb", np.array([1.0, 0.0])) is None
+
+    cache = SemanticCache(max_entries=2)
+    for i, vec in enumerate(([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])):
+        cache.store("nb", np.array(vec), [], f"answer{i}")
+    assert cache.lookup("nb", np.array([1.0, 0.0, 0.0])) is None
+    assert cache.lookup("nb", np.array([0.0, 0.0, 1.0])).response == "answer2"
+
+
+if __name__ == "__main__":
+    test_near_duplicate_hits()
+    test_dissimilar_misses()
+    test_namespaces_are_isolated()
+    test_ttl_and_lru_eviction()
+    print("All semantic cache tests passed!")
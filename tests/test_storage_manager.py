@@ -0,0 +1,57 @@
+"""Basic tests for storage_manager module."""
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ["DATA_ROOT"] = tempfile.mkdtemp()
+
+from core.storage_manager import (
+    save_extracted_text, load_notebook_text, save_artifact_file, resolve_notebook_path, copy_raw_file,
+)
+
+
+def test_load_notebook_text_joins_sources():
+    save_extracted_text("tester", "nb1", "doc1", "First source.")
+    save_extracted_text("tester", "nb1", "doc2", "Second source.")
+    text = load_notebook_text("tester", "nb1", ["doc1", "doc2"])
+    assert text == "First source.\n\nSecond source."
+
+
+def test_load_notebook_text_missing_source():
+    save_extracted_text("tester", "nb2", "doc1", "Only source.")
+    assert load_notebook_text("tester", "nb2", ["doc1", "legacy_doc"]) is None
+
+
+def test_load_notebook_text_cached_per_source_list():
+    save_extracted_text("tester", "nb5", "doc1", "Alpha.")
+    assert load_notebook_text("tester", "nb5", ["doc1"]) == "Alpha."
+    # A new source changes the key, so the cached single-source text is not reused
+    save_extracted_text("tester", "nb5", "doc2", "Beta.")
+    assert load_notebook_text("tester", "nb5", ["doc1", "doc2"]) == "Alpha.\n\nBeta."
+
+
+def test_artifact_file_roundtrip():
+    rel = save_artifact_file("tester", "nb3", "podcast.mp3", b"ID3fake")
+    assert rel == os.path.join("artifacts", "podcast.mp3")
+    with open(resolve_notebook_path("tester", "nb3", rel), "rb") as f:
+        assert f.read() == b"ID3fake"
+    assert resolve_notebook_path("tester", "nb3", "../../nb1/files_extracted/doc1.txt") is None
+
+
+def test_copy_raw_file():
+    src = os.path.join(tempfile.mkdtemp(), "slides.pptx")
+    with open(src, "wb") as f:
+        f.write(b"PK fake pptx")
+    dest = copy_raw_file("tester", "nb4", "slides.pptx", src)
+    with open(dest, "rb") as f:
+        assert f.read() == b"PK fake pptx"
+
+
+if __name__ == "__main__":
+    test_load_notebook_text_joins_sources()
+    test_load_notebook_text_missing_source()
+    test_load_notebook_text_cached_per_source_list()
+    test_artifact_file_roundtrip()
+    test_copy_raw_file()
+    print("All storage manager tests passed!")